@@ -5,40 +5,421 @@ Assign the built-in RBAC 'admin' role to an existing user in PostgreSQL.
 
 Usage:
   python addadmin.py <username>
+  python addadmin.py --batch < usernames.txt
+  python addadmin.py --from-file usernames.txt
 
 Notes:
   - This does NOT create the user; it only assigns the role.
   - It also sets users.is_admin = true for UI convenience.
+  - --batch reads one username per line from stdin and assigns them all over
+    a single connection/transaction using a server-side prepared statement.
+  - --from-file COPYs the usernames into a temp table and assigns them all
+    with one set-based statement (bulk provisioning).
+  - Commits use synchronous_commit = off (this transaction only). A server
+    crash in the brief WAL-flush window can lose the assignment; re-run the
+    command if that happens (every mode is idempotent).
 """
 
 from __future__ import annotations
 
-import argparse
-import psycopg2
+import sys
+from types import SimpleNamespace
 
-from constants import get_db_connection_string
+# psycopg2 (C extension) and constants are imported lazily inside the
+# functions that need them so `--help` and argument errors exit fast.
 
 
-def main() -> int:
-    parser = argparse.ArgumentParser()
-    parser.add_argument("username")
-    parser.add_argument("--role", default="admin", help="Role name to assign")
-    parser.add_argument(
-        "--dsn",
-        default=None,
-        help="Override Postgres DSN (otherwise uses server_config.json, env, or constants.py fallback)",
+_ASSIGN_ROLE_TEMPLATE = """
+    WITH u AS (
+        -- KEY SHARE blocks a concurrent DELETE of the user until we commit,
+        -- so the user_roles insert cannot hit a foreign-key violation.
+        SELECT id, is_admin FROM users WHERE username = {username} FOR KEY SHARE
+    ), r AS (
+        SELECT id FROM roles WHERE name = {role}
+    ), upd AS (
+        -- Skip the row write (and its WAL) when the flag is already set.
+        UPDATE users SET is_admin = TRUE
+        WHERE id = (SELECT id FROM u WHERE NOT is_admin) AND EXISTS (SELECT 1 FROM r)
+        RETURNING id
+    ), ins AS (
+        INSERT INTO user_roles (user_id, role_id)
+        SELECT u.id, r.id FROM u, r
+        ON CONFLICT (user_id, role_id) DO NOTHING
+        RETURNING 1
     )
-    args = parser.parse_args()
+    SELECT (SELECT id FROM u), (SELECT id FROM r), EXISTS (SELECT 1 FROM ins);
+"""
+
+# Parameters arrive already normalised (see main()): username stripped, role
+# stripped and lower-cased.
+ASSIGN_ROLE_SQL = _ASSIGN_ROLE_TEMPLATE.format(username="%s", role="%s")
+
+# Prefixed to each transaction's first statement (no extra round-trip):
+#   - synchronous_commit=off: skip waiting for the WAL fsync on commit.
+#     Re-running is the recovery path.
+#   - jit=off: the statements are tiny; JIT cost-estimation is pure overhead.
+#   - plan_cache_mode=force_custom_plan: keep the --batch prepared statement
+#     on parameter-specific plans instead of a generic plan.
+# The planner settings go through pg_settings so a server without one
+# (plan_cache_mode < PG 12, jit < PG 11) just skips it. They are
+# transaction-local rather than connection startup options, which older
+# servers and PgBouncer in transaction mode would reject.
+TXN_PREFIX_SQL = """
+    SET LOCAL synchronous_commit = off;
+    SELECT set_config(name, CASE name WHEN 'jit' THEN 'off' ELSE 'force_custom_plan' END, true)
+    FROM pg_settings WHERE name IN ('jit', 'plan_cache_mode');
+"""
+
+# Same statement as a server-side prepared statement (batch mode).
+PREPARE_ASSIGN_ROLE_SQL = "PREPARE addadmin_stmt (text, text) AS" + _ASSIGN_ROLE_TEMPLATE.format(
+    username="$1", role="$2"
+)
+
+
+def assign_admin(conn, username: str, role: str = "admin") -> int:
+    """Assign *role* to *username* on an already-open connection.
+
+    The connection is committed (or rolled back) but never closed, so callers
+    holding a long-lived or pooled connection can reuse it across calls
+    instead of paying a fresh connect per assignment.
+
+    Returns the CLI exit code (0 = assigned or already assigned,
+    1 = user/role not found).
+    """
+    with conn.cursor() as cur:
+        # One round-trip: resolve both ids, flip is_admin and insert the
+        # role assignment. The writes only happen when both ids resolved.
+        cur.execute(TXN_PREFIX_SQL + ASSIGN_ROLE_SQL, (username, role))
+        user_id, role_id, inserted = cur.fetchone()
+    if user_id is None:
+        conn.rollback()
+        print(f"User not found: {username}")
+        return 1
+    if role_id is None:
+        conn.rollback()
+        print(f"Role not found: {role}. Did you run init_database?")
+        return 1
+    conn.commit()
+    if not inserted:
+        print(f"{username} already has role '{role}' ✅")
+        return 0
+    print(f"Assigned role '{role}' to {username} ✅")
+    return 0
+
+
+# Statements per execute_batch() round-trip in --batch mode.
+BULK_PAGE_SIZE = 1000
+
+
+# ON CONFLICT (user_id, role_id) needs a unique index over exactly those
+# columns (the user_roles primary key in a schema built by init_database).
+_USER_ROLES_UNIQUE_INDEX_SQL = """
+    SELECT 1
+    FROM pg_index i
+    WHERE i.indrelid = to_regclass('user_roles')
+      AND i.indisunique AND i.indisvalid AND i.indnkeyatts = 2
+      AND (
+          SELECT array_agg(a.attname::text ORDER BY a.attname::text)
+          FROM pg_attribute a
+          WHERE a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+      ) = ARRAY['role_id', 'user_id'];
+"""
+
+
+def _check_user_roles_index(cur) -> bool:
+    """Pre-flight for the batch modes: fail with a clear fix instead of mid-batch."""
+    cur.execute(_USER_ROLES_UNIQUE_INDEX_SQL)
+    if cur.fetchone() is not None:
+        return True
+    print("❌ user_roles has no unique index on (user_id, role_id); ON CONFLICT cannot use it.")
+    print("Fix: CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS ux_user_roles ON user_roles (user_id, role_id);")
+    return False
+
+
+# Set-based assignment for every username staged in the _adm temp table.
+_ASSIGN_STAGED_SQL = """
+    WITH u AS (
+        SELECT users.id, users.is_admin
+        FROM users JOIN _adm USING (username)
+        FOR KEY SHARE OF users
+    ), r AS (
+        SELECT id FROM roles WHERE name = %s
+    ), upd AS (
+        UPDATE users SET is_admin = TRUE
+        FROM u
+        WHERE users.id = u.id AND NOT u.is_admin AND EXISTS (SELECT 1 FROM r)
+        RETURNING users.id
+    ), ins AS (
+        INSERT INTO user_roles (user_id, role_id)
+        SELECT u.id, r.id FROM u, r
+        ON CONFLICT (user_id, role_id) DO NOTHING
+        RETURNING 1
+    )
+    SELECT
+        (SELECT id FROM r),
+        (SELECT count(*) FROM u),
+        (SELECT count(*) FROM ins),
+        ARRAY(
+            SELECT a.username FROM _adm a
+            WHERE NOT EXISTS (SELECT 1 FROM users WHERE users.username = a.username)
+            ORDER BY a.username
+        );
+"""
+
+
+def _assign_bulk(conn, usernames: list[str], role: str) -> int:
+    """Assign *role* to every username with set-based statements.
+
+    The usernames are COPYed into a temp table and joined in one statement,
+    so the work is a fixed handful of round-trips however long the list is.
+    """
+    import csv
+    import io
+
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows([u] for u in dict.fromkeys(usernames))
+    buf.seek(0)
+
+    with conn.cursor() as cur:
+        if not _check_user_roles_index(cur):
+            return 1
+        cur.execute(TXN_PREFIX_SQL + "CREATE TEMP TABLE _adm (username TEXT PRIMARY KEY) ON COMMIT DROP;")
+        cur.copy_expert("COPY _adm (username) FROM STDIN WITH (FORMAT csv);", buf)
+        cur.execute(_ASSIGN_STAGED_SQL, (role,))
+        role_id, found, inserted, missing = cur.fetchone()
+    if role_id is None:
+        conn.rollback()
+        print(f"Role not found: {role}. Did you run init_database?")
+        return 1
+    conn.commit()
+    for username in missing:
+        print(f"User not found: {username}")
+    print(f"Assigned role '{role}' to {inserted} user(s) ✅ ({found - inserted} already had it)")
+    return 1 if missing else 0
+
+
+# Role id plus how many of the batch's users already hold the role. The
+# EXECUTEs' own results are not returned by execute_batch, so the number
+# newly assigned is the users found afterwards minus this count.
+_BATCH_PRECHECK_SQL = """
+    SELECT
+        (SELECT id FROM roles WHERE name = %(role)s),
+        (SELECT count(*)
+           FROM user_roles ur
+           JOIN users u ON u.id = ur.user_id
+           JOIN roles r ON r.id = ur.role_id
+          WHERE r.name = %(role)s AND u.username = ANY(%(usernames)s));
+"""
+
+
+def _assign_batch(conn, usernames: list[str], role: str) -> int:
+    """Assign *role* to every username, parsing/planning the statement once.
+
+    EXECUTEs are sent BULK_PAGE_SIZE at a time via execute_batch, so a batch
+    costs a handful of round-trips instead of one per username.
+    """
+    from psycopg2.extras import execute_batch
+
+    with conn.cursor() as cur:
+        if not _check_user_roles_index(cur):
+            return 1
+        # PREPARE, the role check and the count of users that already hold
+        # the role share a round-trip.
+        cur.execute(
+            TXN_PREFIX_SQL + PREPARE_ASSIGN_ROLE_SQL + _BATCH_PRECHECK_SQL,
+            {"role": role, "usernames": usernames},
+        )
+        role_id, already = cur.fetchone()
+        if role_id is None:
+            conn.rollback()
+            print(f"Role not found: {role}. Did you run init_database?")
+            return 1
+        execute_batch(
+            cur,
+            "EXECUTE addadmin_stmt (%s, %s);",
+            [(username, role) for username in usernames],
+            page_size=BULK_PAGE_SIZE,
+        )
+        cur.execute("SELECT username FROM users WHERE username = ANY(%s);", (usernames,))
+        known = {row[0] for row in cur.fetchall()}
+    conn.commit()
+    missing = [u for u in dict.fromkeys(usernames) if u not in known]
+    for username in missing:
+        print(f"User not found: {username}")
+    print(f"Assigned role '{role}' to {len(known) - already} user(s) ✅ ({already} already had it)")
+    return 1 if missing else 0
+
+
+USAGE = """\
+usage: addadmin.py [-h] [--batch | --from-file PATH] [--role ROLE] [--dsn DSN] [username]
+
+options:
+  -h, --help        show this help message and exit
+  --batch           Read usernames (one per line) from stdin instead of the positional argument
+  --from-file PATH  Read usernames (one per line) from PATH and assign them in bulk
+  --role ROLE       Role name to assign (default: admin)
+  --dsn DSN         Override Postgres DSN (otherwise uses server_config.json, env, or constants.py fallback)
+"""
+
+_VALUE_OPTS = {"--from-file": "from_file", "--role": "role", "--dsn": "dsn"}
+
+
+def _usage_error(msg: str) -> None:
+    sys.stderr.write(USAGE.splitlines()[0] + "\n")
+    sys.stderr.write(f"addadmin.py: error: {msg}\n")
+    raise SystemExit(2)
+
+
+def _parse_args(argv: list[str]) -> SimpleNamespace:
+    """Minimal argv parser (argparse costs more to import than this script runs)."""
+    args = SimpleNamespace(username=None, batch=False, from_file=None, role="admin", dsn=None)
+    it = iter(argv)
+    positional_only = False
+    for arg in it:
+        if not positional_only:
+            if arg == "--":
+                # Everything after "--" is positional (e.g. a username starting with "-").
+                positional_only = True
+                continue
+            if arg in ("-h", "--help"):
+                sys.stdout.write(USAGE)
+                raise SystemExit(0)
+            if arg == "--batch":
+                args.batch = True
+                continue
+            opt, eq, value = arg.partition("=")
+            if opt in _VALUE_OPTS:
+                if not eq:
+                    value = next(it, None)
+                    if value is None:
+                        _usage_error(f"argument {opt}: expected one argument")
+                setattr(args, _VALUE_OPTS[opt], value)
+                continue
+            if arg.startswith("-") and arg != "-":
+                _usage_error(f"unrecognized arguments: {arg}")
+        if args.username is not None:
+            _usage_error(f"unrecognized arguments: {arg}")
+        args.username = arg
+    if args.batch and args.from_file:
+        _usage_error("argument --from-file: not allowed with argument --batch")
+    if args.username is not None and (args.batch or args.from_file):
+        opt = "--batch" if args.batch else "--from-file"
+        _usage_error(f"argument username: not allowed with argument {opt}")
+    return args
+
+
+# Seconds libpq waits for the connection (unless the DSN sets its own), so
+# a wrong or unreachable host fails fast instead of hanging.
+CONNECT_TIMEOUT = 2
+
+
+def _dsn_params(dsn: str) -> dict:
+    from psycopg2.extensions import parse_dsn
+
+    try:
+        return parse_dsn(dsn)
+    except Exception:
+        return {}
+
+
+def _session_options(params: dict) -> dict:
+    """Extra psycopg2.connect() kwargs, leaving anything set in the DSN alone."""
+    extra = {}
+    if "connect_timeout" not in params:
+        extra["connect_timeout"] = CONNECT_TIMEOUT
+    if "application_name" not in params:
+        extra["application_name"] = "echochat-addadmin"
+    return extra
+
+
+def _start_connect(dsn: str):
+    """Open the connection on a worker thread.
+
+    Returns a callable that waits for the handshake and returns the
+    connection (or re-raises the connect error). psycopg2 releases the GIL
+    while connecting, so input can be read in the meantime.
+    """
+    import threading
+
+    import psycopg2
+
+    result: dict = {}
+
+    def run() -> None:
+        try:
+            params = _dsn_params(dsn)
+            result["conn"] = psycopg2.connect(dsn, **_session_options(params))
+        except Exception as e:
+            result["error"] = e
+
+    t = threading.Thread(target=run, name="addadmin-connect", daemon=True)
+    t.start()
+
+    def wait():
+        t.join()
+        if "error" in result:
+            raise result["error"]
+        return result["conn"]
+
+    return wait
+
+
+def _read_usernames(args) -> list[str] | None:
+    """Read batch usernames from --from-file or stdin; None after printing an error."""
+    if args.from_file:
+        try:
+            with open(args.from_file, encoding="utf-8") as fh:
+                usernames = [line.strip() for line in fh if line.strip()]
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Could not read {args.from_file}: {e}")
+            return None
+        if not usernames:
+            print(f"No usernames in {args.from_file}")
+            return None
+        return usernames
+    try:
+        usernames = [line.strip() for line in sys.stdin if line.strip()]
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Could not read stdin: {e}")
+        return None
+    if not usernames:
+        print("No usernames on stdin")
+        return None
+    return usernames
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = _parse_args(sys.argv[1:] if argv is None else argv)
 
-    username = args.username.strip()
     role = args.role.strip().lower()
-    if not username:
-        print("Username required")
-        return 2
+    bulk = bool(args.from_file or args.batch)
+    if not bulk:
+        username = (args.username or "").strip()
+        if not username:
+            print("Username required")
+            return 2
+
+    from constants import get_db_connection_string
 
     dsn = args.dsn or get_db_connection_string()
+    # Overlap the connect round-trip with reading the batch input.
+    wait_for_conn = _start_connect(dsn)
+    if bulk:
+        usernames = None
+        try:
+            usernames = _read_usernames(args)
+        finally:
+            if usernames is None:
+                # Bad input (or an error reading it): still join the connect
+                # thread and close whatever it opened.
+                try:
+                    wait_for_conn().close()
+                except Exception:
+                    pass
+        if usernames is None:
+            return 2
     try:
-        conn = psycopg2.connect(dsn)
+        conn = wait_for_conn()
     except Exception as e:
         print("❌ Could not connect to Postgres.")
         print(f"DSN used: {dsn}")
@@ -46,33 +427,11 @@ def main() -> int:
         print(f"Details: {e}")
         return 3
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id FROM users WHERE username = %s;", (username,))
-            row = cur.fetchone()
-            if not row:
-                print(f"User not found: {username}")
-                return 1
-            user_id = row[0]
-
-            cur.execute("SELECT id FROM roles WHERE name = %s;", (role,))
-            r = cur.fetchone()
-            if not r:
-                print(f"Role not found: {role}. Did you run init_database?")
-                return 1
-            role_id = r[0]
-
-            cur.execute("UPDATE users SET is_admin = TRUE WHERE id = %s;", (user_id,))
-            cur.execute(
-                """
-                INSERT INTO user_roles (user_id, role_id)
-                VALUES (%s, %s)
-                ON CONFLICT (user_id, role_id) DO NOTHING;
-                """,
-                (user_id, role_id),
-            )
-        conn.commit()
-        print(f"Assigned role '{role}' to {username} ✅")
-        return 0
+        if args.from_file:
+            return _assign_bulk(conn, usernames, role)
+        if args.batch:
+            return _assign_batch(conn, usernames, role)
+        return assign_admin(conn, username, role)
     finally:
         conn.close()
 
@@ -8,6 +8,16 @@ Design goals:
   - Admin UI is delivered only when the server is rendering /chat for an admin user.
   - Admin UI calls existing /admin/* endpoints (RBAC-protected) using fetch(..., credentials:'include').
 
+Delivery:
+  - /chat for an admin gets only a small inline loader stub (ADMIN_PANEL_STUB_JS). It
+    fetches /admin/panel/admin_panel.<hash>.{css,js} after page load when the panel
+    was left open, otherwise on the first Ctrl+Alt+P, so admins who keep it closed
+    never parse it.
+  - Those assets are served by routes_auth.py behind the same admin check as the
+    injection itself (never from /static), pre-compressed (gzip, plus brotli when
+    the optional `brotli` package is installed). The content hash in the name lets
+    the browser cache them as immutable; ETags cover revalidation.
+
 Security notes:
   - The HTML/JS/CSS is injected only when users.is_admin is TRUE.
   - All privileged actions still require valid access JWT + RBAC permission checks.
@@ -16,17 +26,28 @@ Security notes:
 
 from __future__ import annotations
 
-def build_admin_injection_snippet() -> str:
-    """Return a single HTML snippet containing the admin panel CSS + JS."""
+import gzip
+import hashlib
+import re
+
+from jinja2 import Environment
+
+try:
+    import brotli  # optional; gzip is always available
+except Exception:  # pragma: no cover
+    brotli = None
+
 
-    css = r"""
+ADMIN_PANEL_CSS = r"""
 
 /* EchoChat Admin Panel — injected (admin only) */
-/* v3: cleaner, more professional UI + better UX (drag, pin, max, toasts) */
 
 #ecAdminPanel{
   --ecap-bg: rgba(12,14,18,.88);
   --ecap-bg2: rgba(18,21,28,.92);
+  --ecap-glass-4: rgba(255,255,255,.04);
+  --ecap-glass-6: rgba(255,255,255,.06);
+  --ecap-glass-8: rgba(255,255,255,.08);
   --ecap-border: rgba(255,255,255,.10);
   --ecap-border2: rgba(255,255,255,.14);
   --ecap-text: #eaf0ff;
@@ -59,6 +80,7 @@ def build_admin_injection_snippet() -> str:
 
 /* Hidden (persisted “closed”) state — can be toggled back with a hotkey */
 #ecAdminPanel.ecap-hidden{ display:none !important; }
+#ecAdminPanel.ecap-dragging{ will-change: transform; }
 
 #ecAdminPanel *{ box-sizing:border-box; }
 #ecAdminPanel ::selection{ background: rgba(124,179,255,.25); }
@@ -70,7 +92,7 @@ def build_admin_injection_snippet() -> str:
   gap:10px;
   padding:10px 10px 8px 12px;
   user-select:none;
-  border-bottom:1px solid rgba(255,255,255,.08);
+  border-bottom:1px solid var(--ecap-glass-8);
   cursor:move;
 }
 
@@ -134,8 +156,8 @@ def build_admin_injection_snippet() -> str:
   width:100%;
   padding:9px 10px;
   border-radius:12px;
-  background: rgba(255,255,255,.06);
-  border: 1px solid rgba(255,255,255,.10);
+  background: var(--ecap-glass-6);
+  border: 1px solid var(--ecap-border);
   color: var(--ecap-text);
   outline:none;
 }
@@ -164,6 +186,8 @@ def build_admin_injection_snippet() -> str:
 #ecAdminPanel.ecap-max{
   display:flex;
   flex-direction:column;
+  width: 740px;
+  height: calc(100vh - 32px);
 }
 #ecAdminPanel.ecap-max .ecap-body{
   display:flex;
@@ -171,8 +195,10 @@ def build_admin_injection_snippet() -> str:
   flex: 1 1 auto;
   min-height: 0;
   overflow:hidden;
+  max-height: none;
+  height: calc(100vh - 72px);
 }
-#ecAdminPanel.ecap-max .ecap-tabs{ flex: 0 0 auto; }
+#ecAdminPanel.ecap-max .ecap-tabs,
 #ecAdminPanel.ecap-max .ecap-toastStack{ flex: 0 0 auto; }
 #ecAdminPanel.ecap-max .ecap-section.active{
   display:flex;
@@ -202,7 +228,7 @@ def build_admin_injection_snippet() -> str:
   flex:1 1 30%;
   border-radius:12px;
   padding: 8px 10px;
-  border:1px solid rgba(255,255,255,.10);
+  border:1px solid var(--ecap-border);
   background: rgba(255,255,255,.05);
   cursor:pointer;
   display:flex;
@@ -224,12 +250,15 @@ def build_admin_injection_snippet() -> str:
 #ecAdminPanel .ecap-row{ display:flex; gap:8px; align-items:center; margin:8px 0; }
 #ecAdminPanel .ecap-row > *{ flex:1; }
 #ecAdminPanel .tight{ flex:0 0 auto; }
-#ecAdminPanel .ecap-hr{ height:1px; background:rgba(255,255,255,.08); margin:12px 0; }
+#ecAdminPanel .ecap-hr{ height:1px; background:var(--ecap-glass-8); margin:12px 0; }
 
-#ecAdminPanel .ecap-card{
-  border:1px solid rgba(255,255,255,.10);
+#ecAdminPanel .ecap-card,
+#ecAdminPanel .ecap-list{
+  border:1px solid var(--ecap-border);
   background: rgba(0,0,0,.18);
   border-radius:14px;
+}
+#ecAdminPanel .ecap-card{
   padding: 10px;
   margin: 10px 0;
 }
@@ -246,8 +275,8 @@ def build_admin_injection_snippet() -> str:
 
 #ecAdminPanel .ecap-statGrid{ display:grid; grid-template-columns: 1fr 1fr 1fr; gap:10px; }
 #ecAdminPanel .ecap-stat{
-  border:1px solid rgba(255,255,255,.10);
-  background: rgba(255,255,255,.04);
+  border:1px solid var(--ecap-border);
+  background: var(--ecap-glass-4);
   border-radius:14px;
   padding:10px;
   min-height:54px;
@@ -258,23 +287,20 @@ def build_admin_injection_snippet() -> str:
 #ecAdminPanel .ecap-list{
   max-height: 210px;
   overflow:auto;
-  border-radius: 14px;
-  border:1px solid rgba(255,255,255,.10);
-  background: rgba(0,0,0,.18);
 }
 #ecAdminPanel .ecap-item{
   display:flex; align-items:center; justify-content:space-between; gap:10px;
   padding: 9px 10px;
-  border-bottom:1px solid rgba(255,255,255,.06);
+  border-bottom:1px solid var(--ecap-glass-6);
 }
 #ecAdminPanel .ecap-item:last-child{ border-bottom:none; }
-#ecAdminPanel .ecap-item:hover{ background: rgba(255,255,255,.04); }
+#ecAdminPanel .ecap-item:hover{ background: var(--ecap-glass-4); }
 
 #ecAdminPanel .ecap-pill{
   display:inline-flex; align-items:center; gap:6px;
   padding: 2px 9px;
   border-radius:999px;
-  border:1px solid rgba(255,255,255,.14);
+  border:1px solid var(--ecap-border2);
   font-size: 11px;
   color: rgba(234,240,255,.92);
 }
@@ -301,7 +327,7 @@ def build_admin_injection_snippet() -> str:
   padding: 10px;
   border-radius: 14px;
   background: rgba(0,0,0,.28);
-  border: 1px solid rgba(255,255,255,.08);
+  border: 1px solid var(--ecap-glass-8);
   font-family: ui-monospace,SFMono-Regular,Menlo,Monaco,Consolas,monospace;
   font-size: 11px;
   color: rgba(234,240,255,.88);
@@ -337,32 +363,58 @@ def build_admin_injection_snippet() -> str:
 #ecAdminPanel.ecap-mini .ecap-body{ display:none; }
 #ecAdminPanel.ecap-mini{ height:52px !important; max-height:52px !important; }
 
-#ecAdminPanel.ecap-max{
-  width: 740px;
-  height: calc(100vh - 32px);
-}
-#ecAdminPanel.ecap-max .ecap-body{ max-height: none; height: calc(100vh - 72px); }
-
 @media (max-width: 520px){
   #ecAdminPanel{ right:10px; left:10px; width:auto; max-width:none; }
 }
 
 """
 
-    js = r"""
+
+ADMIN_PANEL_JS = r"""
 
 (function(){
   if (!window || !document) return;
   if (!window.IS_ADMIN) return;
 
   const STATE_KEY = 'ecap_state_v3';
-  const state = (()=>{
-    try{ return JSON.parse(localStorage.getItem(STATE_KEY)||'{}') || {}; }catch(_){ return {}; }
-  })();
-  function saveState(){ try{ localStorage.setItem(STATE_KEY, JSON.stringify(state)); }catch(_){ } }
+  // Persisted UI state, read from localStorage on first access rather than at
+  // script load. Non-object payloads fall back to {}.
+  let _state = null;
+  function loadState(){
+    if (_state === null){
+      try{ _state = JSON.parse(localStorage.getItem(STATE_KEY)); }catch(_){ _state = null; }
+      if (!_state || typeof _state !== 'object') _state = {};
+    }
+    return _state;
+  }
+  const state = new Proxy({}, {
+    get(_, k){ return loadState()[k]; },
+    set(_, k, v){ loadState()[k] = v; return true; },
+  });
+  // localStorage writes block the main thread; coalesce bursts (drag, toggles,
+  // tab switches) into one write and flush whatever is pending on unload.
+  let _stateDirty = false;
+  function writeState(){
+    if (!_stateDirty) return;
+    _stateDirty = false;
+    try{ localStorage.setItem(STATE_KEY, JSON.stringify(loadState())); }catch(_){ }
+  }
+  const _saveStateSoon = debounce(writeState, 200);
+  function saveState(){ _stateDirty = true; _saveStateSoon(); }
+  window.addEventListener('pagehide', writeState);
+  window.addEventListener('beforeunload', writeState);
 
   // Panel reference + recovery helpers (prevents “blank panel” and allows hotkey reopen)
   let panelRef = null;
+  // Timers, observers and document listeners owned by the current panel;
+  // released before a rebuild so they don't pile up.
+  let panelCleanups = [];
+  function onPanelTeardown(fn){ panelCleanups.push(fn); }
+  function teardownPanel(){
+    const fns = panelCleanups;
+    panelCleanups = [];
+    for (const fn of fns){ try{ fn(); }catch(_){ } }
+  }
   function getPanel(){ return panelRef || document.getElementById('ecAdminPanel'); }
 
   function ensurePanel(){
@@ -395,21 +447,25 @@ def build_admin_injection_snippet() -> str:
       state.mini = false;
     }
 
-    // If it ended up off-screen, reset to default position.
-    try{
-      const r = p.getBoundingClientRect();
-      const pad = 12;
-      const vw = window.innerWidth || document.documentElement.clientWidth || 0;
-      const vh = window.innerHeight || document.documentElement.clientHeight || 0;
-      const offscreen = (r.right < pad) || (r.left > vw - pad) || (r.bottom < pad) || (r.top > vh - pad);
-      if (offscreen){
-        p.style.left = '';
-        p.style.top = '';
-        p.style.right = '16px';
-        state.left = undefined;
-        state.top = undefined;
-      }
-    }catch(_){}
+    // If it ended up off-screen, reset to default position. Only a saved
+    // (dragged) position can be off-screen; the default right:16px one cannot,
+    // so skip the forced layout in that case.
+    if (state.left != null || state.top != null){
+      try{
+        const r = p.getBoundingClientRect();
+        const pad = 12;
+        const vw = window.innerWidth || document.documentElement.clientWidth || 0;
+        const vh = window.innerHeight || document.documentElement.clientHeight || 0;
+        const offscreen = (r.right < pad) || (r.left > vw - pad) || (r.bottom < pad) || (r.top > vh - pad);
+        if (offscreen){
+          p.style.left = '';
+          p.style.top = '';
+          p.style.right = '16px';
+          state.left = undefined;
+          state.top = undefined;
+        }
+      }catch(_){}
+    }
 
     saveState();
     return p;
@@ -460,7 +516,7 @@ def build_admin_injection_snippet() -> str:
         return;
       }
     }catch(_){}
-  }, true);
+  }, {capture:true, passive:false});
 
   // Debug helpers (optional)
   window.ECAP = window.ECAP || {};
@@ -469,19 +525,42 @@ def build_admin_injection_snippet() -> str:
   window.ECAP.toggle = togglePanel;
   window.ECAP.reset = resetPanel;
 
-  const logLines = [];
-  function log(msg){
-    const s = `[admin] ${new Date().toISOString()} ${msg}`;
-    logLines.push(s);
-    if (logLines.length > 200) logLines.shift();
+  // Log writes are coalesced into one DOM update per frame, so a burst of
+  // log() calls costs a single layout.
+  // The last LOG_CAP lines live in a ring buffer: logN counts every line
+  // ever written, logN % LOG_CAP is the next slot.
+  const LOG_CAP = 200;
+  const logBuf = new Array(LOG_CAP);
+  let logN = 0;
+  let _logPending = false;
+  function flushLog(){
+    _logPending = false;
     const el = document.querySelector('#ecAdminPanel .ecap-log');
-    if (el) el.textContent = logLines.join('\n');
+    if (!el) return;
+    const count = Math.min(logN, LOG_CAP);
+    const start = logN > LOG_CAP ? logN % LOG_CAP : 0;
+    const lines = new Array(count);
+    for (let i = 0; i < count; i++) lines[i] = logBuf[(start + i) % LOG_CAP];
+    el.textContent = lines.join('\n');
+  }
+  function log(msg){
+    logBuf[logN++ % LOG_CAP] = `[admin] ${new Date().toISOString()} ${msg}`;
+    if (!_logPending){
+      _logPending = true;
+      requestAnimationFrame(flushLog);
+    }
   }
 
+  // Parsed cookie values, valid for as long as document.cookie is unchanged.
+  let _cookieStr = null, _cookieCache = {};
   function getCookie(name){
-    const parts = (`; ${document.cookie}`).split(`; ${name}=`);
-    if (parts.length === 2) return parts.pop().split(';').shift();
-    return null;
+    const c = document.cookie;
+    if (c !== _cookieStr){ _cookieStr = c; _cookieCache = {}; }
+    if (name in _cookieCache) return _cookieCache[name];
+    const parts = (`; ${c}`).split(`; ${name}=`);
+    const v = parts.length === 2 ? parts.pop().split(';').shift() : null;
+    _cookieCache[name] = v;
+    return v;
   }
 
   function fmtUptime(sec){
@@ -497,6 +576,13 @@ def build_admin_injection_snippet() -> str:
     return parts.join(' ');
   }
 
+  // Run cosmetic work (success log lines/toasts) once the browser is idle,
+  // so an action's network result is handled before it.
+  function idle(cb){
+    if (window.requestIdleCallback) return requestIdleCallback(cb, {timeout: 200});
+    return setTimeout(cb, 0);
+  }
+
   function debounce(fn, ms){
     let t = null;
     return (...args)=>{
@@ -577,8 +663,8 @@ def build_admin_injection_snippet() -> str:
     }
   }
 
-  async function getJSON(url){
-    const r = await adminFetch(url, {method:'GET'});
+  async function getJSON(url, opts){
+    const r = await adminFetch(url, Object.assign({method:'GET'}, opts||{}));
     const j = await r.json().catch(()=>null);
     if (!r.ok){
       const e = (j && (j.error || j.message)) ? (j.error || j.message) : `HTTP ${r.status}`;
@@ -590,7 +676,7 @@ def build_admin_injection_snippet() -> str:
 
   async function postForm(url, data){
     const fd = new FormData();
-    for (const [k,v] of Object.entries(data||{})) fd.append(k, v);
+    if (data) for (const k in data){ if (Object.prototype.hasOwnProperty.call(data, k)) fd.append(k, data[k]); }
     const r = await adminFetch(url, {method:'POST', body: fd});
     const j = await r.json().catch(()=>null);
     if (!r.ok){
@@ -619,7 +705,9 @@ def build_admin_injection_snippet() -> str:
   function el(tag, attrs){
     const n = document.createElement(tag);
     if (attrs){
-      for (const [k,v] of Object.entries(attrs)){
+      for (const k in attrs){
+        if (!Object.prototype.hasOwnProperty.call(attrs, k)) continue;
+        const v = attrs[k];
         if (k === 'class') n.className = v;
         else if (k === 'html') n.innerHTML = v;
         else if (k === 'text') n.textContent = v;
@@ -633,8 +721,376 @@ def build_admin_injection_snippet() -> str:
     return (s === null || s === undefined) ? '' : String(s);
   }
 
+  // Static panel shell, parsed in one innerHTML assignment per build.
+  const PANEL_HTML = `
+    <div class="ecap-head">
+      <div class="ecap-titleRow">
+        <div class="ecap-dot" title="API status"></div>
+        <div class="ecap-titleBlock">
+          <div class="ecap-title">EchoChat Admin</div>
+          <div class="ecap-subtitle">Admin-only controls (RBAC + JWT)</div>
+        </div>
+      </div>
+      <div class="ecap-headBtns">
+        <button class="ecap-iconBtn" title="Refresh" data-action="refresh">⟳</button>
+        <button class="ecap-iconBtn" title="Pin/Unpin" data-action="pin">📌</button>
+        <button class="ecap-iconBtn" title="Maximize" data-action="max">⛶</button>
+        <button class="ecap-iconBtn" title="Minimize" data-action="mini">▁</button>
+        <button class="ecap-iconBtn danger" title="Close" data-action="close">✕</button>
+      </div>
+    </div>
+    <div class="ecap-body">
+      <div class="ecap-toastStack" id="ecapToastStack"></div>
+      <template id="ecapToastTpl"><div class="ecap-toast"><div style="min-width:0"><div class="tmsg" style="font-weight:700;white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div><div class="tmeta" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div></div><div class="x" title="Dismiss" data-action="dismiss">✕</div></div></template>
+      <div class="ecap-tabs">
+        <button class="ecap-tab" type="button" data-tab="dash" data-action="tab:dash"><span class="ico">📊</span><span>Dashboard</span></button>
+        <button class="ecap-tab" type="button" data-tab="users" data-action="tab:users"><span class="ico">👤</span><span>Users</span></button>
+        <button class="ecap-tab" type="button" data-tab="rooms" data-action="tab:rooms"><span class="ico">🏷️</span><span>Rooms</span></button>
+        <button class="ecap-tab" type="button" data-tab="settings" data-action="tab:settings"><span class="ico">⚙️</span><span>Settings</span></button>
+        <button class="ecap-tab" type="button" data-tab="audit" data-action="tab:audit"><span class="ico">🧾</span><span>Audit</span></button>
+      </div>
+      <div class="ecap-section" data-sec="dash"></div>
+      <div class="ecap-section" data-sec="users"></div>
+      <div class="ecap-section" data-sec="rooms"></div>
+      <div class="ecap-section" data-sec="settings"></div>
+      <div class="ecap-section" data-sec="audit"></div>
+    </div>
+  `;
+
+  // Static section skeletons; buildPanel wires them up after assignment.
+  const SEC_DASH_HTML = `
+    <div class="ecap-card">
+      <h4>Overview</h4>
+      <div class="ecap-statGrid" style="margin-top:8px">
+        <div class="ecap-stat"><div class="lbl">Online</div><div class="val" id="ecapStatOnline">—</div></div>
+        <div class="ecap-stat"><div class="lbl">Registered</div><div class="val" id="ecapStatUsers">—</div></div>
+        <div class="ecap-stat"><div class="lbl">Rooms</div><div class="val" id="ecapStatRooms">—</div></div>
+        <div class="ecap-stat"><div class="lbl">Sessions</div><div class="val" id="ecapStatSessions">—</div></div>
+        <div class="ecap-stat"><div class="lbl">Uptime</div><div class="val" id="ecapStatUptime">—</div></div>
+        <div class="ecap-stat"><div class="lbl">Postgres</div><div class="val" id="ecapStatPg">—</div></div>
+      </div>
+
+      <div class="ecap-row" style="margin-top:10px">
+        <div class="ecap-pill warn">Server time: <b id="ecapStatNow" style="font-weight:750">—</b></div>
+        <div class="ecap-pill">Voice rooms: <b id="ecapVoiceRooms" style="font-weight:750">—</b></div>
+        <div class="ecap-pill">Voice users: <b id="ecapVoiceUsers" style="font-weight:750">—</b></div>
+      </div>
+
+      <div class="ecap-grid2" style="margin-top:10px">
+        <div class="ecap-card" style="margin:0">
+          <h4>Voice cap</h4>
+          <div class="ecap-muted">0 (or empty) = unlimited. Lowering the cap disconnects random users to meet the limit.</div>
+          <div class="ecap-row" style="margin-top:10px">
+            <input id="ecapVoiceMax" placeholder="0 = unlimited" inputmode="numeric" />
+            <button id="ecapVoiceApply" class="ecap-btn primary tight" type="button">Apply</button>
+          </div>
+        </div>
+        <div class="ecap-card" style="margin:0">
+          <h4>Feature snapshot</h4>
+          <div id="ecapFeaturePills" class="ecap-actions"></div>
+          <div class="ecap-muted" style="margin-top:8px">Edits are in the Settings tab (super-admin).</div>
+        </div>
+      </div>
+    </div>
+
+    <div class="ecap-card">
+      <h4>Live roster</h4>
+      <div class="ecap-muted">Click a username to load details.</div>
+      <div id="ecapOnlineList" class="ecap-actions" style="margin-top:10px"></div>
+      <div class="ecap-hr"></div>
+
+      <div class="ecap-drop" id="ecapDrop">
+        <div style="font-weight:750">🎯 Target user</div>
+        <div class="ecap-muted" style="margin-top:4px">Drag-and-drop a username from the UI, or type it below.</div>
+        <div style="margin-top:10px">Current: <span id="ecapTargetUser" style="font-weight:780">(none)</span></div>
+        <div class="ecap-row" style="margin-top:10px">
+          <input id="ecapTargetInput" placeholder="username" />
+          <button id="ecapTargetLoad" class="ecap-btn primary tight" type="button">Load</button>
+        </div>
+      </div>
+    </div>
+
+    <div class="ecap-card">
+      <h4>Admin log</h4>
+      <div class="ecap-log"></div>
+    </div>
+  `;
+
+  const SEC_USERS_HTML = `
+    <div class="ecap-card">
+      <h4>User search</h4>
+      <div class="ecap-row">
+        <input id="ecapUserQuery" placeholder="Search username / email / id…" />
+        <select id="ecapUserMode" class="tight" title="Match mode">
+          <option value="contains">contains</option>
+          <option value="prefix">prefix</option>
+          <option value="exact">exact</option>
+          <option value="email">email</option>
+          <option value="id">id</option>
+        </select>
+        <button id="ecapUserSearchBtn" class="ecap-btn tight" type="button">Search</button>
+      </div>
+
+      <div class="ecap-row">
+        <label class="ecap-pill tight"><input id="ecapUserOnlineOnly" type="checkbox" style="width:auto" /> online</label>
+        <label class="ecap-pill tight"><input id="ecapUserAdminsOnly" type="checkbox" style="width:auto" /> admins</label>
+        <select id="ecapUserStatus" class="tight" title="Account status">
+          <option value="any">any status</option>
+          <option value="active">active</option>
+          <option value="deactivated">deactivated</option>
+        </select>
+        <span class="ecap-muted tight">Click a row to load.</span>
+      </div>
+
+      <div class="ecap-list" id="ecapUserResults"></div>
+      <template id="ecapUserRowTpl"><div class="ecap-item"><div style="min-width:0"><div class="rname" style="font-weight:780;white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div><div class="ecap-muted rsub" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div></div><div style="display:flex;gap:8px;align-items:center;flex:0 0 auto"><span class="rpills" style="display:contents"></span><button class="ecap-btn tight" data-act="load" type="button">Load</button></div></div></template>
+    </div>
+
+    <div class="ecap-card">
+      <h4>Selected user</h4>
+      <div class="ecap-row">
+        <input id="ecapSelUser" placeholder="username" />
+        <button id="ecapLoadUser" class="ecap-btn primary tight" type="button">Load</button>
+      </div>
+
+      <div id="ecapUserSummary" class="ecap-grid2"></div>
+      <template id="ecapKvTpl"><div class="ecap-stat"><div class="lbl"></div><div class="val" style="font-size:13px"></div></div></template>
+
+      <div class="ecap-hr"></div>
+
+      <div class="ecap-muted">Actions</div>
+      <div class="ecap-grid2" style="margin-top:8px">
+        <div class="ecap-card" style="margin:0">
+          <h4>Session</h4>
+          <div class="ecap-actions" id="ecapActSession"></div>
+        </div>
+        <div class="ecap-card" style="margin:0">
+          <h4>Account</h4>
+          <div class="ecap-actions" id="ecapActAccount"></div>
+        </div>
+        <div class="ecap-card" style="margin:0">
+          <h4>Security</h4>
+          <div class="ecap-actions" id="ecapActSecurity"></div>
+        </div>
+        <div class="ecap-card" style="margin:0">
+          <h4>Moderation</h4>
+          <div class="ecap-actions" id="ecapActMod"></div>
+        </div>
+      </div>
+      <template id="ecapModFormTpl"><div class="ecap-card" style="flex-basis:100%;margin:4px 0 0;display:none">
+        <div class="ecap-grid2">
+          <input name="suspend_minutes" inputmode="numeric" placeholder="Suspend (minutes)" />
+          <input name="mute_minutes" inputmode="numeric" placeholder="Mute (minutes)" />
+          <input name="messages_per_hour" inputmode="numeric" placeholder="Quota (messages/hour)" />
+          <input name="status" placeholder="Custom status" />
+          <input name="role" placeholder="Assign role (admin:super)" />
+          <label class="ecap-pill tight"><input name="clear_status" type="checkbox" style="width:auto" /> clear custom status</label>
+          <label class="ecap-pill tight"><input name="shadowban" type="checkbox" style="width:auto" /> shadowban (admin:super)</label>
+        </div>
+        <div class="ecap-row" style="margin-top:8px">
+          <input name="reason" placeholder="Reason (optional)" />
+          <button class="ecap-btn primary tight" data-act="apply" type="button">Apply</button>
+        </div>
+      </div></template>
+
+      <div class="ecap-muted" style="margin-top:10px">Some actions require super-admin or specific permissions.</div>
+    </div>
+
+    <details class="ecap-card">
+      <summary style="cursor:pointer;font-weight:750">Create user</summary>
+      <div class="ecap-muted" style="margin-top:6px">Requires super-admin.</div>
+      <div class="ecap-row" style="margin-top:10px">
+        <input id="ecapCreateUser" placeholder="username" />
+        <input id="ecapCreateEmail" placeholder="email (optional)" />
+      </div>
+      <div class="ecap-row">
+        <input id="ecapCreatePass" placeholder="password" type="password" />
+        <label class="ecap-pill tight"><input id="ecapCreateIsAdmin" type="checkbox" style="width:auto" /> admin</label>
+        <button id="ecapCreateBtn" class="ecap-btn primary tight" type="button">Create</button>
+      </div>
+    </details>
+  `;
+
+  const SEC_ROOMS_HTML = `
+    <div class="ecap-card">
+      <h4>Rooms</h4>
+      <div class="ecap-row">
+        <button id="ecapRoomsReload" class="ecap-btn tight" type="button">Reload</button>
+        <input id="ecapRoomFilter" placeholder="Filter rooms…" />
+      </div>
+      <div class="ecap-list" id="ecapRoomList"></div>
+      <template id="ecapRoomRowTpl"><div class="ecap-item"><div style="min-width:0"><div class="rname" style="font-weight:780;white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div><div class="ecap-muted rsub"></div></div><div style="display:flex;gap:6px;align-items:center;flex:0 0 auto"><span class="rpills" style="display:contents"></span><button class="ecap-btn tight" data-act="lock" type="button"></button><button class="ecap-btn tight" data-act="ro" type="button"></button><button class="ecap-btn tight" data-act="sm" type="button">Slow</button><button class="ecap-btn danger tight" data-act="del" type="button">Delete</button><button class="ecap-btn danger tight" data-act="clear" type="button">Clear</button></div></div></template>
+    </div>
+
+    <div class="ecap-card">
+      <h4>Kick / ban user from room</h4>
+      <div class="ecap-row">
+        <input id="ecapKRUser" placeholder="username" />
+        <input id="ecapKRRoom" placeholder="room" />
+      </div>
+      <div class="ecap-actions">
+        <button id="ecapKickBtn" class="ecap-btn tight" type="button">Kick</button>
+        <button id="ecapRoomBanBtn" class="ecap-btn danger tight" type="button">Room ban</button>
+      </div>
+    </div>
+
+    <div class="ecap-card">
+      <h4>Broadcast</h4>
+      <textarea id="ecapBroadcast" placeholder="Global announcement…"></textarea>
+      <div class="ecap-row">
+        <button id="ecapBroadcastBtn" class="ecap-btn primary tight" type="button">Send broadcast</button>
+      </div>
+    </div>
+  `;
+
+  const SEC_SETTINGS_HTML = `
+    <div class="ecap-card">
+      <h4>General settings (super-admin)</h4>
+      <div class="ecap-muted">Persists to settings file. Some changes require clients to reload or a server restart.</div>
+      <div class="ecap-hr"></div>
+      <div class="ecap-grid2" id="ecapSettingsForm"></div>
+      <div class="ecap-hr"></div>
+      <div class="ecap-row">
+        <button id="ecapSettingsReload" class="ecap-btn tight" type="button">Reload</button>
+        <button id="ecapSettingsApply" class="ecap-btn primary tight" type="button">Apply</button>
+      </div>
+    </div>
+
+    <div class="ecap-card" style="margin-top:10px">
+      <h4>GIFs (GIPHY) (super-admin)</h4>
+      <div class="ecap-muted">GIF search uses a server-side proxy. If the key is missing, the GIF modal shows an error. The key is stored in the server settings file.</div>
+      <div class="ecap-hr"></div>
+      <div class="ecap-grid2">
+        <div class="ecap-card" style="margin:0">
+          <div class="ecap-muted">API key</div>
+          <div class="ecap-row" style="margin-top:10px">
+            <input id="ecapGiphyKey" type="password" placeholder="Paste GIPHY key…" />
+            <button id="ecapGiphyShow" class="ecap-btn tight" type="button">Show</button>
+          </div>
+          <div class="ecap-muted" style="margin-top:8px">Status: <b id="ecapGiphyKeyStatus" style="font-weight:780">—</b></div>
+        </div>
+        <div class="ecap-card" style="margin:0">
+          <div class="ecap-muted">Search policy</div>
+          <div class="ecap-row" style="margin-top:10px">
+            <input id="ecapGiphyRating" placeholder="pg-13" />
+            <input id="ecapGiphyLang" placeholder="en" />
+            <input id="ecapGiphyLimit" inputmode="numeric" placeholder="24" />
+          </div>
+          <div class="ecap-muted" style="margin-top:8px">rating / language / default limit</div>
+        </div>
+      </div>
+      <div class="ecap-hr"></div>
+      <div class="ecap-row">
+        <button id="ecapGiphyReload" class="ecap-btn tight" type="button">Reload</button>
+        <button id="ecapGiphyApply" class="ecap-btn primary tight" type="button">Apply</button>
+      </div>
+    </div>
+
+    <div class="ecap-card" style="margin-top:10px">
+      <h4>Anti-abuse (super-admin)</h4>
+      <div class="ecap-muted">Updates apply immediately on server. Be careful with very low windows/limits.</div>
+      <div class="ecap-hr"></div>
+      <div class="ecap-grid2" id="ecapAntiForm"></div>
+      <div class="ecap-hr"></div>
+      <div class="ecap-row">
+        <button id="ecapAntiReload" class="ecap-btn tight" type="button">Reload</button>
+        <button id="ecapAntiApply" class="ecap-btn primary tight" type="button">Apply</button>
+      </div>
+    </div>
+    <template id="ecapFieldBoolTpl"><div class="ecap-card" style="margin:0"><div style="display:flex;align-items:center;justify-content:space-between;gap:10px"><div style="min-width:0"><div class="ecap-muted"></div></div><input type="checkbox" style="width:auto" /></div></div></template>
+    <template id="ecapFieldTextTpl"><div class="ecap-card" style="margin:0"><div class="ecap-muted"></div><input placeholder="" /></div></template>
+    <template id="ecapFieldIntTpl"><div class="ecap-card" style="margin:0"><div class="ecap-muted"></div><input inputmode="numeric" placeholder="" /></div></template>
+    <template id="ecapFieldHintTpl"><div class="ecap-muted" style="margin-top:6px"></div></template>
+  `;
+
+  // Settings form schemas. Rows are [label, input id, type, hint]; the id is
+  // the server key with a set_/anti_ prefix, stripped here once. The *_KEYS
+  // lists (server keys) drive Apply.
+  function fieldSchema(prefix, rows){
+    return rows.map(([label, id, type, hint])=>({label, id, key: id.slice(prefix.length), type, hint}));
+  }
+
+  const GENERAL_FIELDS = fieldSchema('set_', [
+    ['Voice enabled','set_voice_enabled','bool',''],
+    ['P2P file enabled','set_p2p_file_enabled','bool',''],
+    ['Giphy enabled','set_giphy_enabled','bool',''],
+    ['Disable file transfer (global)','set_disable_file_transfer_globally','bool',''],
+    ['Disable group files (global)','set_disable_group_files_globally','bool',''],
+    ['Require DM E2EE','set_require_dm_e2ee','bool',''],
+    ['Allow plaintext DM fallback','set_allow_plaintext_dm_fallback','bool',''],
+    ['Max message length (chars)','set_max_message_length','int',''],
+    ['Max attachment size (bytes)','set_max_attachment_size','int',''],
+    ['Max DM file bytes','set_max_dm_file_bytes','int',''],
+    ['Max group upload bytes','set_max_group_upload_bytes','int',''],
+    ['Group msg rate limit','set_group_msg_rate_limit','int','messages per window'],
+    ['Group msg window seconds','set_group_msg_rate_window_sec','int',''],
+
+    // Background cleanup / TTL
+    ['Custom room idle hours (public)','set_custom_room_idle_hours','int','Empty custom rooms are auto-deleted after this many hours'],
+    ['Custom room idle hours (private)','set_custom_private_room_idle_hours','int','Private rooms are usually more ephemeral (default 24h)'],
+    ['Janitor interval (seconds)','set_janitor_interval_seconds','int','How often cleanup runs (10..3600)']
+  ]);
+  const GENERAL_BOOL_KEYS = ['voice_enabled','p2p_file_enabled','giphy_enabled','disable_file_transfer_globally','disable_group_files_globally','require_dm_e2ee','allow_plaintext_dm_fallback'];
+  const GENERAL_INT_KEYS = ['max_message_length','max_attachment_size','max_dm_file_bytes','max_group_upload_bytes','group_msg_rate_limit','group_msg_rate_window_sec','custom_room_idle_hours','custom_private_room_idle_hours','janitor_interval_seconds'];
+
+  const ANTI_FIELDS = fieldSchema('anti_', [
+    ['Room msg rate limit','anti_room_msg_rate_limit','text','Format: "N@seconds" (example 20@10)'],
+    ['Room msg window seconds','anti_room_msg_rate_window_sec','int',''],
+    ['DM msg rate limit','anti_dm_msg_rate_limit','text','Format: "N@seconds"'],
+    ['DM msg window seconds','anti_dm_msg_rate_window_sec','int',''],
+    ['File offer rate limit','anti_file_offer_rate_limit','text','Format: "N@seconds"'],
+    ['File offer window seconds','anti_file_offer_rate_window_sec','int',''],
+    ['Default room slowmode (sec)','anti_room_slowmode_default_sec','int',''],
+    ['Strikes before auto-mute','anti_antiabuse_strikes_before_mute','int',''],
+    ['Strike window (sec)','anti_antiabuse_strike_window_sec','int',''],
+    ['Auto-mute minutes','anti_antiabuse_auto_mute_minutes','int',''],
+    ['Join rate limit','anti_room_join_rate_limit','text','Format: "N@seconds"'],
+    ['Join window seconds','anti_room_join_rate_window_sec','int',''],
+    ['Room create rate limit','anti_room_create_rate_limit','text','Format: "N@seconds"'],
+    ['Room create window seconds','anti_room_create_rate_window_sec','int',''],
+    ['Allow users to create rooms','anti_allow_user_create_rooms','bool',''],
+    ['Max room name length','anti_max_room_name_length','int',''],
+    ['Friend request rate limit','anti_friend_req_rate_limit','text','Format: "N@seconds"'],
+    ['Friend request window seconds','anti_friend_req_rate_window_sec','int',''],
+    ['Friend unique targets max','anti_friend_req_unique_targets_max','int',''],
+    ['Friend unique targets window','anti_friend_req_unique_targets_window_sec','int',''],
+    ['Max links per message','anti_max_links_per_message','int',''],
+    ['Max magnets per message','anti_max_magnets_per_message','int',''],
+    ['Max mentions per message','anti_max_mentions_per_message','int',''],
+    ['Dup msg window (sec)','anti_dup_msg_window_sec','int',''],
+    ['Dup msg max repeats','anti_dup_msg_max','int',''],
+    ['Dup msg min length','anti_dup_msg_min_length','int',''],
+    ['Normalize dup compare','anti_dup_msg_normalize','bool','Lowercase + collapse spaces']
+  ]);
+  const ANTI_BOOL_KEYS = ['allow_user_create_rooms','dup_msg_normalize'];
+  const ANTI_INT_KEYS = [
+    'room_msg_rate_window_sec','dm_msg_rate_window_sec','file_offer_rate_window_sec','room_slowmode_default_sec',
+    'antiabuse_strikes_before_mute','antiabuse_strike_window_sec','antiabuse_auto_mute_minutes',
+    'room_join_rate_window_sec','room_create_rate_window_sec','max_room_name_length',
+    'friend_req_rate_window_sec','friend_req_unique_targets_max','friend_req_unique_targets_window_sec',
+    'max_links_per_message','max_magnets_per_message','max_mentions_per_message',
+    'dup_msg_window_sec','dup_msg_max','dup_msg_min_length'
+  ];
+  const ANTI_TEXT_KEYS = [
+    'room_msg_rate_limit','dm_msg_rate_limit','file_offer_rate_limit','room_join_rate_limit','room_create_rate_limit','friend_req_rate_limit'
+  ];
+
+  const SEC_AUDIT_HTML = `
+    <div class="ecap-card ecap-fill ecap-fillCol" style="gap:8px">
+      <h4>Audit log</h4>
+      <div class="ecap-row">
+        <input id="ecapAuditQ" placeholder="Filter (actor, action, target, details)…" />
+        <button id="ecapAuditRefresh" class="ecap-btn tight" type="button">Refresh</button>
+      </div>
+      <div class="ecap-list ecap-fillScroll" id="ecapAuditList"></div>
+      <template id="ecapAuditRowTpl"><div class="ecap-item"><div style="min-width:0"><div style="font-weight:750;white-space:nowrap;overflow:hidden;text-overflow:ellipsis"><span class="raction"></span> <span class="ecap-muted rts"></span></div><div class="ecap-muted rwho" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div><div class="ecap-muted rdetails" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis"></div></div></div></template>
+    </div>
+  `;
+
   function buildPanel(){
-    const panel = el('div', {id:'ecAdminPanel'});
+    teardownPanel();
+    const panel = document.createElement('div');
+    panel.id = 'ecAdminPanel';
     if (state.max && !state.mini) panel.classList.add('ecap-max');
     if (state.mini) panel.classList.add('ecap-mini');
     if (state.pinned) panel.classList.add('ecap-pinned');
@@ -646,87 +1102,37 @@ def build_admin_injection_snippet() -> str:
       panel.style.right = 'auto';
     }
 
-    const head = el('div', {class:'ecap-head'});
-
-    const titleRow = el('div', {class:'ecap-titleRow'});
-    const dot = el('div', {class:'ecap-dot', title:'API status'});
-    const titleBlock = el('div', {class:'ecap-titleBlock'});
-    const title = el('div', {class:'ecap-title', text:'EchoChat Admin'});
-    const subtitle = el('div', {class:'ecap-subtitle', text:'Admin-only controls (RBAC + JWT)'});
-    titleBlock.appendChild(title);
-    titleBlock.appendChild(subtitle);
-    titleRow.appendChild(dot);
-    titleRow.appendChild(titleBlock);
-
-    const btns = el('div', {class:'ecap-headBtns'});
-    const btnRefresh = el('button', {class:'ecap-iconBtn', title:'Refresh', text:'⟳'});
-    const btnPin = el('button', {class:'ecap-iconBtn', title:'Pin/Unpin', text:'📌'});
-    const btnMax = el('button', {class:'ecap-iconBtn', title:'Maximize', text:'⛶'});
-    const btnMini = el('button', {class:'ecap-iconBtn', title:'Minimize', text:'▁'});
-    const btnClose = el('button', {class:'ecap-iconBtn danger', title:'Close', text:'✕'});
-    btns.appendChild(btnRefresh);
-    btns.appendChild(btnPin);
-    btns.appendChild(btnMax);
-    btns.appendChild(btnMini);
-    btns.appendChild(btnClose);
-
-    head.appendChild(titleRow);
-    head.appendChild(btns);
-
-    const body = el('div', {class:'ecap-body'});
-    const toastStack = el('div', {class:'ecap-toastStack', id:'ecapToastStack'});
-    body.appendChild(toastStack);
-
-    const tabs = el('div', {class:'ecap-tabs'});
-    const tabNames = [
-      ['dash','📊','Dashboard'],
-      ['users','👤','Users'],
-      ['rooms','🏷️','Rooms'],
-      ['settings','⚙️','Settings'],
-      ['audit','🧾','Audit']
-    ];
+    panel.innerHTML = PANEL_HTML;
+    const head = panel.querySelector('.ecap-head');
+    const dot = panel.querySelector('.ecap-dot');
     const tabEls = {};
-    for (const [key, ico, label] of tabNames){
-      const t = el('button', {class:'ecap-tab', type:'button', html:`<span class="ico">${ico}</span><span>${label}</span>`});
-      tabs.appendChild(t);
-      tabEls[key] = t;
-    }
+    for (const t of panel.querySelectorAll('.ecap-tab')) tabEls[t.dataset.tab] = t;
+    const [secDash, secUsers, secRooms, secSettings, secAudit] = panel.querySelectorAll('.ecap-section');
 
-    const secDash = el('div', {class:'ecap-section', 'data-sec':'dash'});
-    const secUsers = el('div', {class:'ecap-section', 'data-sec':'users'});
-    const secRooms = el('div', {class:'ecap-section', 'data-sec':'rooms'});
-    const secSettings = el('div', {class:'ecap-section', 'data-sec':'settings'});
-    const secAudit = el('div', {class:'ecap-section', 'data-sec':'audit'});
-
-    body.appendChild(tabs);
-    body.appendChild(secDash);
-    body.appendChild(secUsers);
-    body.appendChild(secRooms);
-    body.appendChild(secSettings);
-    body.appendChild(secAudit);
-
-    panel.appendChild(head);
-    panel.appendChild(body);
     document.body.appendChild(panel);
     panelRef = panel;
 
+    const toastTpl = panel.querySelector('#ecapToastTpl').content.firstElementChild;
     function toast(type, msg, meta, ms){
       const st = document.getElementById('ecapToastStack');
       if (!st) return;
-      const t = el('div', {class:`ecap-toast ${type||''}`});
-      t.innerHTML = `<div style="min-width:0">
-        <div class="tmsg" style="font-weight:700;white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${safe(msg)}</div>
-        <div class="tmeta" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${safe(meta||'')}</div>
-      </div>
-      <div class="x" title="Dismiss">✕</div>`;
-      t.querySelector('.x').addEventListener('click', ()=>t.remove());
+      const t = toastTpl.cloneNode(true);
+      if (type) t.classList.add(type);
+      t.querySelector('.tmsg').textContent = safe(msg);
+      t.querySelector('.tmeta').textContent = safe(meta);
       st.prepend(t);
       const ttl = (ms === undefined || ms === null) ? 3200 : ms;
       if (ttl > 0) setTimeout(()=>{ try{ t.remove(); }catch(_){ } }, ttl);
     }
 
+    // Rooms and Settings build their DOM and fetch their data the first time
+    // their tab is shown; roomsTab exposes the Rooms refresh hooks once built.
+    let roomsTab = null;
+    let settingsInited = false;
     function setTab(key){
-      for (const [k, t] of Object.entries(tabEls)) t.classList.toggle('active', k===key);
+      if (key === 'rooms') initRoomsTab();
+      else if (key === 'settings') initSettingsTab();
+      for (const k in tabEls) tabEls[k].classList.toggle('active', k===key);
       secDash.classList.toggle('active', key==='dash');
       secUsers.classList.toggle('active', key==='users');
       secRooms.classList.toggle('active', key==='rooms');
@@ -735,15 +1141,35 @@ def build_admin_injection_snippet() -> str:
       state.tab = key;
       saveState();
     }
-    for (const [k,t] of Object.entries(tabEls)) t.addEventListener('click', ()=>setTab(k));
     setTab(state.tab || 'dash');
 
-    // Buttons: stop drag initiation
-    [btnRefresh, btnPin, btnMax, btnMini, btnClose].forEach(b=>{
-      b.addEventListener('pointerdown', e=>e.stopPropagation());
+    // Handlers for the static chrome (tabs, head buttons, toast dismiss), keyed by
+    // the first part of data-action; one delegated listener routes to them.
+    const DISPATCH = {
+      tab(key){
+        setTab(key);
+        if (key === 'users') restoreSearch(false);
+      },
+      dismiss(_, e){ const t = e.target.closest('.ecap-toast'); if (t) t.remove(); },
+      close(){ hidePanel(); },
+      // Rapid clicks coalesce into one /admin/bulk request; the lists are
+      // rendered in an idle slot after stats/rooms.
+      refresh: debounce(()=>{
+        invalidateSearchCache();
+        refreshBulk(true);
+        toast('info','Refreshed','Stats + lists updated');
+        log('manual refresh');
+      }, 250),
+    };
+    panel.addEventListener('click', (e)=>{
+      const t = e.target.closest('[data-action]');
+      if (!t || !panel.contains(t)) return;
+      const [kind, arg] = t.dataset.action.split(':');
+      const fn = DISPATCH[kind];
+      if (fn) fn(arg, e);
     });
 
-    btnMini.addEventListener('click', ()=>{
+    DISPATCH.mini = ()=>{
       const willMini = !panel.classList.contains('ecap-mini');
       if (willMini){
         // If we're maximized, collapse cleanly (otherwise you get a huge blank box).
@@ -768,9 +1194,9 @@ def build_admin_injection_snippet() -> str:
       }
       state.mini = panel.classList.contains('ecap-mini');
       saveState();
-    });
+    };
 
-    btnMax.addEventListener('click', ()=>{
+    DISPATCH.max = ()=>{
       // If minimized, un-minimize first (otherwise it looks blank / broken).
       if (panel.classList.contains('ecap-mini')){
         panel.classList.remove('ecap-mini');
@@ -781,9 +1207,9 @@ def build_admin_injection_snippet() -> str:
       panel.classList.toggle('ecap-max');
       state.max = panel.classList.contains('ecap-max');
       saveState();
-    });
+    };
 
-    btnPin.addEventListener('click', ()=>{
+    DISPATCH.pin = ()=>{
       state.pinned = !state.pinned;
       panel.classList.toggle('ecap-pinned', !!state.pinned);
       if (state.pinned){
@@ -794,9 +1220,7 @@ def build_admin_injection_snippet() -> str:
         panel.style.position = 'fixed';
       }
       saveState();
-    });
-
-    btnClose.addEventListener('click', ()=>{ hidePanel(); });
+    };
 
     if (state.closed){
       // Start hidden, but keep the panel fully initialised so it can be reopened via hotkey.
@@ -804,33 +1228,52 @@ def build_admin_injection_snippet() -> str:
     }
 
     // drag (disabled when pinned)
-    let dragging=false, offX=0, offY=0;
+    // While dragging, the panel is moved with a compositor-only transform
+    // relative to where the drag started (baseX/baseY); left/top are committed
+    // once on release. Viewport/panel sizes are read once per drag (maxX/maxY),
+    // so moves never force a layout just to clamp.
+    let dragging=false, offX=0, offY=0, maxX=0, maxY=0, baseX=0, baseY=0, curX=0, curY=0;
     head.addEventListener('pointerdown', (e)=>{
       if (e.button !== 0) return;
       if (state.pinned) return;
       if (e.target && e.target.closest && e.target.closest('button')) return;
       dragging=true;
       const r = panel.getBoundingClientRect();
+      baseX = curX = r.left;
+      baseY = curY = r.top;
       offX = e.clientX - r.left;
       offY = e.clientY - r.top;
+      maxX = window.innerWidth - r.width - 8;
+      maxY = window.innerHeight - r.height - 8;
+      panel.classList.add('ecap-dragging');
       head.setPointerCapture(e.pointerId);
     });
     head.addEventListener('pointermove', (e)=>{
       if (!dragging) return;
-      const x = Math.max(8, Math.min(window.innerWidth - panel.offsetWidth - 8, e.clientX - offX));
-      const y = Math.max(8, Math.min(window.innerHeight - panel.offsetHeight - 8, e.clientY - offY));
-      panel.style.left = x + 'px';
-      panel.style.top = y + 'px';
-      panel.style.right = 'auto';
-    });
-    head.addEventListener('pointerup', ()=>{
+      let x = e.clientX - offX;
+      x = x > maxX ? maxX : x;
+      x = x < 8 ? 8 : x;
+      let y = e.clientY - offY;
+      y = y > maxY ? maxY : y;
+      y = y < 8 ? 8 : y;
+      curX = x;
+      curY = y;
+      panel.style.transform = `translate3d(${x - baseX}px,${y - baseY}px,0)`;
+    }, {passive:true});
+    function endDrag(){
       if (!dragging) return;
       dragging=false;
-      const r = panel.getBoundingClientRect();
-      state.left = Math.round(r.left);
-      state.top = Math.round(r.top);
+      panel.style.left = curX + 'px';
+      panel.style.top = curY + 'px';
+      panel.style.right = 'auto';
+      panel.style.transform = '';
+      panel.classList.remove('ecap-dragging');
+      state.left = Math.round(curX);
+      state.top = Math.round(curY);
       saveState();
-    });
+    }
+    head.addEventListener('pointerup', endDrag);
+    head.addEventListener('pointercancel', endDrag);
 
     // Shared target user
     let targetUser = null;
@@ -846,63 +1289,7 @@ def build_admin_injection_snippet() -> str:
     }
 
     // DASHBOARD
-    secDash.innerHTML = `
-      <div class="ecap-card">
-        <h4>Overview</h4>
-        <div class="ecap-statGrid" style="margin-top:8px">
-          <div class="ecap-stat"><div class="lbl">Online</div><div class="val" id="ecapStatOnline">—</div></div>
-          <div class="ecap-stat"><div class="lbl">Registered</div><div class="val" id="ecapStatUsers">—</div></div>
-          <div class="ecap-stat"><div class="lbl">Rooms</div><div class="val" id="ecapStatRooms">—</div></div>
-          <div class="ecap-stat"><div class="lbl">Sessions</div><div class="val" id="ecapStatSessions">—</div></div>
-          <div class="ecap-stat"><div class="lbl">Uptime</div><div class="val" id="ecapStatUptime">—</div></div>
-          <div class="ecap-stat"><div class="lbl">Postgres</div><div class="val" id="ecapStatPg">—</div></div>
-        </div>
-
-        <div class="ecap-row" style="margin-top:10px">
-          <div class="ecap-pill warn">Server time: <b id="ecapStatNow" style="font-weight:750">—</b></div>
-          <div class="ecap-pill">Voice rooms: <b id="ecapVoiceRooms" style="font-weight:750">—</b></div>
-          <div class="ecap-pill">Voice users: <b id="ecapVoiceUsers" style="font-weight:750">—</b></div>
-        </div>
-
-        <div class="ecap-grid2" style="margin-top:10px">
-          <div class="ecap-card" style="margin:0">
-            <h4>Voice cap</h4>
-            <div class="ecap-muted">0 (or empty) = unlimited. Lowering the cap disconnects random users to meet the limit.</div>
-            <div class="ecap-row" style="margin-top:10px">
-              <input id="ecapVoiceMax" placeholder="0 = unlimited" inputmode="numeric" />
-              <button id="ecapVoiceApply" class="ecap-btn primary tight" type="button">Apply</button>
-            </div>
-          </div>
-          <div class="ecap-card" style="margin:0">
-            <h4>Feature snapshot</h4>
-            <div id="ecapFeaturePills" class="ecap-actions"></div>
-            <div class="ecap-muted" style="margin-top:8px">Edits are in the Settings tab (super-admin).</div>
-          </div>
-        </div>
-      </div>
-
-      <div class="ecap-card">
-        <h4>Live roster</h4>
-        <div class="ecap-muted">Click a username to load details.</div>
-        <div id="ecapOnlineList" class="ecap-actions" style="margin-top:10px"></div>
-        <div class="ecap-hr"></div>
-
-        <div class="ecap-drop" id="ecapDrop">
-          <div style="font-weight:750">🎯 Target user</div>
-          <div class="ecap-muted" style="margin-top:4px">Drag-and-drop a username from the UI, or type it below.</div>
-          <div style="margin-top:10px">Current: <span id="ecapTargetUser" style="font-weight:780">(none)</span></div>
-          <div class="ecap-row" style="margin-top:10px">
-            <input id="ecapTargetInput" placeholder="username" />
-            <button id="ecapTargetLoad" class="ecap-btn primary tight" type="button">Load</button>
-          </div>
-        </div>
-      </div>
-
-      <div class="ecap-card">
-        <h4>Admin log</h4>
-        <div class="ecap-log"></div>
-      </div>
-    `;
+    secDash.innerHTML = SEC_DASH_HTML;
 
     const drop = secDash.querySelector('#ecapDrop');
     drop.addEventListener('dragover', (e)=>{ e.preventDefault(); drop.classList.add('dragover'); });
@@ -926,7 +1313,9 @@ def build_admin_injection_snippet() -> str:
     });
 
     async function refreshVoiceSettings(){
-      const j = await getJSON('/admin/settings/voice');
+      applyVoiceSettings(await getJSON('/admin/settings/voice'));
+    }
+    function applyVoiceSettings(j){
       if (j && j.ok){
         const v = String(j.voice_max_room_peers ?? 0);
         const inp = secDash.querySelector('#ecapVoiceMax');
@@ -952,83 +1341,7 @@ def build_admin_injection_snippet() -> str:
     });
 
     // USERS
-    secUsers.innerHTML = `
-      <div class="ecap-card">
-        <h4>User search</h4>
-        <div class="ecap-row">
-          <input id="ecapUserQuery" placeholder="Search username / email / id…" />
-          <select id="ecapUserMode" class="tight" title="Match mode">
-            <option value="contains">contains</option>
-            <option value="prefix">prefix</option>
-            <option value="exact">exact</option>
-            <option value="email">email</option>
-            <option value="id">id</option>
-          </select>
-          <button id="ecapUserSearchBtn" class="ecap-btn tight" type="button">Search</button>
-        </div>
-
-        <div class="ecap-row">
-          <label class="ecap-pill tight"><input id="ecapUserOnlineOnly" type="checkbox" style="width:auto" /> online</label>
-          <label class="ecap-pill tight"><input id="ecapUserAdminsOnly" type="checkbox" style="width:auto" /> admins</label>
-          <select id="ecapUserStatus" class="tight" title="Account status">
-            <option value="any">any status</option>
-            <option value="active">active</option>
-            <option value="deactivated">deactivated</option>
-          </select>
-          <span class="ecap-muted tight">Click a row to load.</span>
-        </div>
-
-        <div class="ecap-list" id="ecapUserResults"></div>
-      </div>
-
-      <div class="ecap-card">
-        <h4>Selected user</h4>
-        <div class="ecap-row">
-          <input id="ecapSelUser" placeholder="username" />
-          <button id="ecapLoadUser" class="ecap-btn primary tight" type="button">Load</button>
-        </div>
-
-        <div id="ecapUserSummary" class="ecap-grid2"></div>
-
-        <div class="ecap-hr"></div>
-
-        <div class="ecap-muted">Actions</div>
-        <div class="ecap-grid2" style="margin-top:8px">
-          <div class="ecap-card" style="margin:0">
-            <h4>Session</h4>
-            <div class="ecap-actions" id="ecapActSession"></div>
-          </div>
-          <div class="ecap-card" style="margin:0">
-            <h4>Account</h4>
-            <div class="ecap-actions" id="ecapActAccount"></div>
-          </div>
-          <div class="ecap-card" style="margin:0">
-            <h4>Security</h4>
-            <div class="ecap-actions" id="ecapActSecurity"></div>
-          </div>
-          <div class="ecap-card" style="margin:0">
-            <h4>Moderation</h4>
-            <div class="ecap-actions" id="ecapActMod"></div>
-          </div>
-        </div>
-
-        <div class="ecap-muted" style="margin-top:10px">Some actions require super-admin or specific permissions.</div>
-      </div>
-
-      <details class="ecap-card">
-        <summary style="cursor:pointer;font-weight:750">Create user</summary>
-        <div class="ecap-muted" style="margin-top:6px">Requires super-admin.</div>
-        <div class="ecap-row" style="margin-top:10px">
-          <input id="ecapCreateUser" placeholder="username" />
-          <input id="ecapCreateEmail" placeholder="email (optional)" />
-        </div>
-        <div class="ecap-row">
-          <input id="ecapCreatePass" placeholder="password" type="password" />
-          <label class="ecap-pill tight"><input id="ecapCreateIsAdmin" type="checkbox" style="width:auto" /> admin</label>
-          <button id="ecapCreateBtn" class="ecap-btn primary tight" type="button">Create</button>
-        </div>
-      </details>
-    `;
+    secUsers.innerHTML = SEC_USERS_HTML;
 
     const qInp = secUsers.querySelector('#ecapUserQuery');
     const qMode = secUsers.querySelector('#ecapUserMode');
@@ -1036,13 +1349,16 @@ def build_admin_injection_snippet() -> str:
     const qAdmins = secUsers.querySelector('#ecapUserAdminsOnly');
     const qStatus = secUsers.querySelector('#ecapUserStatus');
     const resBox = secUsers.querySelector('#ecapUserResults');
+    const userRowTpl = secUsers.querySelector('#ecapUserRowTpl').content.firstElementChild;
     const selInp = secUsers.querySelector('#ecapSelUser');
     const summaryBox = secUsers.querySelector('#ecapUserSummary');
+    const kvTpl = secUsers.querySelector('#ecapKvTpl').content.firstElementChild;
 
     const actSession = secUsers.querySelector('#ecapActSession');
     const actAccount = secUsers.querySelector('#ecapActAccount');
     const actSecurity = secUsers.querySelector('#ecapActSecurity');
     const actMod = secUsers.querySelector('#ecapActMod');
+    const modFormTpl = secUsers.querySelector('#ecapModFormTpl').content.firstElementChild;
 
     // Create user controls (super-admin)
     const cuUser = secUsers.querySelector('#ecapCreateUser');
@@ -1061,18 +1377,24 @@ def build_admin_injection_snippet() -> str:
         log(`created user ${username} (admin=${is_admin})`);
         toast('ok','User created', username);
         cuPass.value = '';
+        invalidateSearchCache();
         runSearch();
       } else {
         toast('err','Create user failed', j && j.error ? j.error : 'unknown');
       }
     });
 
-    function badgeHTML(u){
-      const pills = [];
-      if (u.online) pills.push('<span class="ecap-pill ok">online</span>');
-      if (u.is_admin) pills.push('<span class="ecap-pill warn">admin</span>');
-      if (u.status && u.status !== 'active') pills.push('<span class="ecap-pill bad">'+safe(u.status)+'</span>');
-      return pills.join(' ');
+    function pill(cls, text){
+      const p = document.createElement('span');
+      p.className = cls ? `ecap-pill ${cls}` : 'ecap-pill';
+      p.textContent = text;
+      return p;
+    }
+
+    function addBadges(box, u){
+      if (u.online) box.appendChild(pill('ok', 'online'));
+      if (u.is_admin) box.appendChild(pill('warn', 'admin'));
+      if (u.status && u.status !== 'active') box.appendChild(pill('bad', safe(u.status)));
     }
 
     function renderSearchResults(users){
@@ -1081,41 +1403,194 @@ def build_admin_injection_snippet() -> str:
         resBox.innerHTML = '<div class="ecap-item"><span class="ecap-muted">No results</span></div>';
         return;
       }
+      appendSearchResults(users);
+    }
+
+    // Adds rows for `users` after the ones already shown (streamed chunks).
+    function appendSearchResults(users){
+      const frag = document.createDocumentFragment();
       for (const u of users){
-        const row = el('div', {class:'ecap-item'});
-        row.innerHTML = `<div style="min-width:0">
-          <div style="font-weight:780;white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${safe(u.username)}</div>
-          <div class="ecap-muted" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${safe(u.email||'')}</div>
-        </div>
-        <div style="display:flex;gap:8px;align-items:center;flex:0 0 auto">
-          ${badgeHTML(u)}
-          <button class="ecap-btn tight" type="button">Load</button>
-        </div>`;
-        const btn = row.querySelector('button');
-        btn.addEventListener('click', (e)=>{
-          e.stopPropagation();
-          setTargetUser(u.username, {syncInput:true, loadDetail:true});
-          toast('info','Loaded', u.username);
-        });
-        row.addEventListener('click', ()=>{
-          setTargetUser(u.username, {syncInput:true, loadDetail:true});
-        });
-        resBox.appendChild(row);
+        // Fixed #ecapUserRowTpl shape: [name/email block, pills+button block].
+        const row = userRowTpl.cloneNode(true);
+        const lead = row.firstElementChild;
+        lead.firstElementChild.textContent = safe(u.username);
+        lead.lastElementChild.textContent = safe(u.email);
+        addBadges(row.lastElementChild.firstElementChild, u);
+        row.dataset.user = u.username;
+        frag.appendChild(row);
       }
+      resBox.appendChild(frag);
+    }
+
+    // Last server result for a given filter set (key). While it was not cut off
+    // by SEARCH_LIMIT, a longer contains/prefix query is a subset of it and is
+    // answered locally. ILIKE wildcards (% _ \) always go to the server.
+    const SEARCH_LIMIT = 60;
+    let lastSearch = {q:'', key:'', users:null};
+    function invalidateSearchCache(){ lastSearch.users = null; }
+    function filterCachedSearch(q, mode, key){
+      if (!lastSearch.users || lastSearch.key !== key) return null;
+      if (mode !== 'contains' && mode !== 'prefix') return null;
+      if (lastSearch.users.length >= SEARCH_LIMIT || /[%_\\]/.test(q)) return null;
+      const ql = q.toLowerCase();
+      if (!ql.startsWith(lastSearch.q.toLowerCase())) return null;
+      const hit = mode === 'prefix'
+        ? (v)=>!!v && v.toLowerCase().startsWith(ql)
+        : (v)=>!!v && v.toLowerCase().includes(ql);
+      return lastSearch.users.filter(u=>hit(u.username) || hit(u.email));
+    }
+
+    resBox.addEventListener('click', (e)=>{
+      const row = e.target.closest('.ecap-item');
+      if (!row || !row.dataset.user) return;
+      const name = row.dataset.user;
+      setTargetUser(name, {syncInput:true, loadDetail:true});
+      if (e.target.closest('[data-act="load"]')) toast('info','Loaded', name);
+    });
+
+    // The last server search is kept per browser tab so that re-entering the
+    // Users tab (or reloading the page) paints at once while runSearch
+    // revalidates in the background.
+    const SEARCH_STORE_KEY = 'ecap.lastSearch';
+    const SEARCH_STORE_TTL = 60000;
+    function storeSearch(params, users){
+      if (users.length >= 200) return;
+      try{ sessionStorage.setItem(SEARCH_STORE_KEY, JSON.stringify(Object.assign({users, ts: Date.now()}, params))); }catch(_){ }
+    }
+    function restoreSearch(restoreInputs){
+      let c = null;
+      try{ c = JSON.parse(sessionStorage.getItem(SEARCH_STORE_KEY)); }catch(_){ c = null; }
+      if (c && Array.isArray(c.users) && Date.now() - (c.ts || 0) < SEARCH_STORE_TTL){
+        if (restoreInputs){
+          qInp.value = c.q || '';
+          qMode.value = c.mode || 'contains';
+          qOnline.checked = c.online === '1';
+          qAdmins.checked = c.admins === '1';
+          qStatus.value = c.status || 'any';
+        }
+        const same = (qInp.value||'').trim() === c.q && (qMode.value || 'contains') === c.mode
+          && (qOnline.checked ? '1':'0') === c.online && (qAdmins.checked ? '1':'0') === c.admins
+          && (qStatus.value || 'any') === c.status;
+        if (same) renderSearchResults(c.users);
+      }
+      runSearch();
+    }
+
+    // Only the newest search may render: starting one cancels the stream or
+    // fetch still in flight.
+    let searchAbort = null;
+    let searchStream = null;
+    // Consecutive streams that failed before their first chunk; after
+    // SEARCH_STREAM_MAX_FAILS the JSON endpoint is used until the cooldown ends.
+    const SEARCH_STREAM_MAX_FAILS = 3;
+    const SEARCH_STREAM_COOLDOWN_MS = 5 * 60 * 1000;
+    let searchStreamFails = 0;
+    let searchStreamRetryAt = 0;
+    function searchStreamOk(){
+      if (typeof EventSource !== 'function') return false;
+      if (searchStreamFails < SEARCH_STREAM_MAX_FAILS) return true;
+      if (Date.now() < searchStreamRetryAt) return false;
+      searchStreamFails = SEARCH_STREAM_MAX_FAILS - 1;  // one more try
+      return true;
+    }
+    function cancelSearch(){
+      if (searchAbort){ searchAbort.abort(); searchAbort = null; }
+      if (searchStream){ searchStream.close(); searchStream = null; }
+    }
+
+    function finishSearch(params, key, users){
+      lastSearch = {q: params.q, key, users};
+      storeSearch(params, users);
+    }
+
+    // Rows arrive over SSE in chunks of 10 and are appended as they come, so the
+    // first ones paint before the whole page is fetched. If the stream fails,
+    // the JSON endpoint redoes the search and replaces any partial list;
+    // streams that keep failing before delivering anything (older server,
+    // proxy) are skipped for a while.
+    function streamSearch(qs, params, key){
+      const es = searchStream = new EventSource('/admin/user_search/stream?'+qs, {withCredentials:true});
+      const users = [];
+      let first = true;
+      es.onmessage = (ev)=>{
+        if (es !== searchStream) return;
+        let m = null;
+        try{ m = JSON.parse(ev.data); }catch(_){ m = null; }
+        if (!m) return;
+        const chunk = m.users || [];
+        if (first){ resBox.innerHTML = ''; first = false; searchStreamFails = 0; }
+        for (const u of chunk) users.push(u);
+        appendSearchResults(chunk);
+        if (m.done){
+          es.close();
+          searchStream = null;
+          if (!users.length) renderSearchResults(users);
+          finishSearch(params, key, users);
+        }
+      };
+      es.onerror = ()=>{
+        es.close();
+        if (es !== searchStream) return;
+        searchStream = null;
+        if (first && ++searchStreamFails >= SEARCH_STREAM_MAX_FAILS){
+          searchStreamRetryAt = Date.now() + SEARCH_STREAM_COOLDOWN_MS;
+          log('INFO search stream unavailable; using /admin/user_search');
+        }
+        fetchSearch(qs, params, key);
+      };
     }
 
-    async function runSearch(){
+    async function fetchSearch(qs, params, key){
+      const ctl = searchAbort = new AbortController();
+      let j;
+      try{
+        j = await getJSON('/admin/user_search?'+qs, {signal: ctl.signal});
+      }catch(e){
+        if (e && e.name === 'AbortError') return;
+        throw e;
+      }
+      if (ctl !== searchAbort) return;
+      searchAbort = null;
+      if (j && j.users){
+        renderSearchResults(j.users);
+        finishSearch(params, key, j.users);
+      }
+    }
+
+    // The current search inputs as a request, or null while the query is too
+    // short to send: one character (or none) with no filter would just return
+    // the first SEARCH_LIMIT users. Ids may be short.
+    function searchRequest(){
       const q = (qInp.value||'').trim();
       const mode = qMode.value || 'contains';
       const online = qOnline.checked ? '1':'0';
       const admins = qAdmins.checked ? '1':'0';
       const status = qStatus.value || 'any';
-      const qs = new URLSearchParams({q, mode, online, admins, status, limit:'60'}).toString();
-      const j = await getJSON('/admin/user_search?'+qs);
-      if (j && j.users) renderSearchResults(j.users);
+      if (q.length < 2 && online === '0' && admins === '0' && status === 'any' && mode !== 'id') return null;
+      // Only q is free text; mode/status come from fixed <select> options and
+      // online/admins are '0'/'1'.
+      const qs = 'q=' + encodeURIComponent(q) + '&mode=' + mode + '&online=' + online + '&admins=' + admins + '&status=' + status + '&limit=' + SEARCH_LIMIT;
+      return {qs, key: `${mode}|${online}|${admins}|${status}`, params: {q, mode, online, admins, status}};
+    }
+
+    function runSearch(){
+      const r = searchRequest();
+      if (!r){
+        cancelSearch();
+        resBox.innerHTML = '<div class="ecap-item"><span class="ecap-muted">Type at least 2 characters…</span></div>';
+        return;
+      }
+      const cached = filterCachedSearch(r.params.q, r.params.mode, r.key);
+      cancelSearch();
+      if (cached){
+        renderSearchResults(cached);
+        return;
+      }
+      if (searchStreamOk()) streamSearch(r.qs, r.params, r.key);
+      else fetchSearch(r.qs, r.params, r.key);
     }
 
-    const runSearchDebounced = debounce(runSearch, 220);
+    const runSearchDebounced = debounce(runSearch, 300);
     qInp.addEventListener('input', runSearchDebounced);
     qMode.addEventListener('change', runSearch);
     qOnline.addEventListener('change', runSearch);
@@ -1132,26 +1607,48 @@ def build_admin_injection_snippet() -> str:
       setTargetUser(u, {syncInput:true, loadDetail:true});
     });
 
-    async function loadUserDetail(u){
+    // Recent /admin/user_detail payloads. Actions whose effect is known patch
+    // the cached copy and re-render without another round trip.
+    const USER_DETAIL_TTL = 5000;
+    const userDetailCache = new Map();
+
+    async function loadUserDetail(u, opts){
       if (!u) return;
       selInp.value = u;
 
+      const c = userDetailCache.get(u);
+      if (c && !(opts && opts.fresh) && Date.now() - c.t < USER_DETAIL_TTL){
+        renderUserDetail(c.payload);
+        return;
+      }
       const j = await getJSON('/admin/user_detail/' + encodeURIComponent(u));
       if (!j || !j.user){
+        userDetailCache.delete(u);
         summaryBox.innerHTML = '<div class="ecap-muted">Not found.</div>';
         [actSession,actAccount,actSecurity,actMod].forEach(x=>x.innerHTML='');
         return;
       }
+      userDetailCache.set(u, {t: Date.now(), payload: j});
       renderUserDetail(j);
     }
 
+    // Apply `patch(payload)` to the cached detail and re-render quietly; once the
+    // entry is gone or stale this is a normal fetch.
+    function patchUserDetail(u, patch){
+      const c = userDetailCache.get(u);
+      if (!c || Date.now() - c.t >= USER_DETAIL_TTL) return loadUserDetail(u, {fresh:true});
+      patch(c.payload);
+      renderUserDetail(c.payload, true);
+    }
+
     function kv(label, value){
-      const d = el('div', {class:'ecap-stat'});
-      d.innerHTML = `<div class="lbl">${safe(label)}</div><div class="val" style="font-size:13px">${safe(value || '—')}</div>`;
+      const d = kvTpl.cloneNode(true);
+      d.firstElementChild.textContent = label;
+      d.lastElementChild.textContent = value || '—';
       return d;
     }
 
-    function renderUserDetail(payload){
+    function renderUserDetail(payload, quiet){
       const u = payload.user || {};
       const roles = (payload.roles || []).join(', ') || '—';
       const sanctions = payload.sanctions || [];
@@ -1160,24 +1657,31 @@ def build_admin_injection_snippet() -> str:
       const created = u.created_at ? new Date(u.created_at).toLocaleString() : '—';
       const counts = payload.counts || {};
 
+      // Build off-DOM and attach once: one layout invalidation, not eleven.
+      const frag = document.createDocumentFragment();
+      frag.appendChild(kv('Email', u.email || '—'));
+      frag.appendChild(kv('Status', u.status || '—'));
+      frag.appendChild(kv('Online', u.online ? 'yes' : 'no'));
+      frag.appendChild(kv('Last seen', lastSeen));
+      frag.appendChild(kv('Created', created));
+      frag.appendChild(kv('2FA', u.two_factor_enabled ? 'enabled' : 'off'));
+      frag.appendChild(kv('Roles', roles));
+      frag.appendChild(kv('Quota', quota));
+      frag.appendChild(kv('Friends', String(counts.friends ?? '—')));
+      frag.appendChild(kv('Groups', String(counts.groups ?? '—')));
+      frag.appendChild(kv('Sanctions', String(sanctions.length)));
       summaryBox.innerHTML = '';
-      summaryBox.appendChild(kv('Email', u.email || '—'));
-      summaryBox.appendChild(kv('Status', u.status || '—'));
-      summaryBox.appendChild(kv('Online', u.online ? 'yes' : 'no'));
-      summaryBox.appendChild(kv('Last seen', lastSeen));
-      summaryBox.appendChild(kv('Created', created));
-      summaryBox.appendChild(kv('2FA', u.two_factor_enabled ? 'enabled' : 'off'));
-      summaryBox.appendChild(kv('Roles', roles));
-      summaryBox.appendChild(kv('Quota', quota));
-      summaryBox.appendChild(kv('Friends', String(counts.friends ?? '—')));
-      summaryBox.appendChild(kv('Groups', String(counts.groups ?? '—')));
-      summaryBox.appendChild(kv('Sanctions', String(sanctions.length)));
+      summaryBox.appendChild(frag);
 
       [actSession,actAccount,actSecurity,actMod].forEach(x=>x.innerHTML='');
 
       function addAction(group, label, fn, css){
-        const b = el('button', {class:`ecap-btn tight ${css||''}`, text:label, type:'button'});
-        b.addEventListener('click', fn);
+        const b = document.createElement('button');
+        b.className = css ? `ecap-btn tight ${css}` : 'ecap-btn tight';
+        b.type = 'button';
+        b.textContent = label;
+        // Any account/moderation action can change what a search returns.
+        b.addEventListener('click', (e)=>{ invalidateSearchCache(); return fn(e); });
         group.appendChild(b);
       }
 
@@ -1185,21 +1689,21 @@ def build_admin_injection_snippet() -> str:
 
       addAction(actSession, 'Force logout', async ()=>{
         const j = await postForm('/admin/force_logout/' + encodeURIComponent(username), {});
-        if (j && j.ok){ log(`revoked tokens for ${username}`); toast('ok','User logged out', username); }
+        if (j && j.ok){ idle(()=>{ log(`revoked tokens for ${username}`); toast('ok','User logged out', username); }); }
         else toast('err','Force logout failed', j && j.error ? j.error : 'unknown');
       });
 
       addAction(actAccount, 'Deactivate', async ()=>{
         if (!confirm(`Deactivate ${username}?`)) return;
         const j = await postForm('/admin/deactivate_user/' + encodeURIComponent(username), {});
-        if (j && j.ok){ log(`deactivated ${username}`); toast('ok','Deactivated', username); loadUserDetail(username); }
+        if (j && j.ok){ idle(()=>{ log(`deactivated ${username}`); toast('ok','Deactivated', username); }); loadUserDetail(username, {fresh:true}); }
         else toast('err','Deactivate failed', j && j.error ? j.error : 'unknown');
       }, 'danger');
 
       addAction(actAccount, 'Delete', async ()=>{
         if (!confirm(`DELETE ${username}? This cannot be undone.`)) return;
         const j = await postForm('/admin/delete_user/' + encodeURIComponent(username), {});
-        if (j && j.ok){ log(`deleted ${username}`); toast('ok','Deleted', username, 4500); }
+        if (j && j.ok){ userDetailCache.delete(username); idle(()=>{ log(`deleted ${username}`); toast('ok','Deleted', username, 4500); }); }
         else toast('err','Delete failed', j && j.error ? j.error : 'unknown', 5200);
       }, 'danger');
 
@@ -1207,7 +1711,7 @@ def build_admin_injection_snippet() -> str:
         const pw = prompt('New password (min 8):') || '';
         if (pw.length < 8) return toast('warn','Password too short','Minimum 8 characters');
         const j = await postForm('/admin/reset_password/' + encodeURIComponent(username), {new_password: pw});
-        if (j && j.ok){ log(`reset pw for ${username}`); toast('ok','Password reset', username); }
+        if (j && j.ok){ idle(()=>{ log(`reset pw for ${username}`); toast('ok','Password reset', username); }); }
         else toast('err','Reset password failed', j && j.error ? j.error : 'unknown');
       }, 'primary');
 
@@ -1215,622 +1719,627 @@ def build_admin_injection_snippet() -> str:
         const pin = (prompt('New 4-digit PIN:')||'').trim();
         if (!/^\d{4}$/.test(pin)) return toast('warn','Invalid PIN','PIN must be 4 digits');
         const j = await postForm('/admin/set_recovery_pin', {username, recovery_pin: pin});
-        if (j && j.ok){ log(`set PIN for ${username}`); toast('ok','PIN updated', username); }
+        if (j && j.ok){ idle(()=>{ log(`set PIN for ${username}`); toast('ok','PIN updated', username); }); }
         else toast('err','PIN update failed', j && j.error ? j.error : 'unknown');
       });
 
       addAction(actSecurity, 'Revoke 2FA', async ()=>{
         if (!confirm(`Revoke 2FA for ${username}?`)) return;
         const j = await postForm('/admin/revoke_2fa/' + encodeURIComponent(username), {});
-        if (j && j.ok){ log(`2FA revoked ${username}`); toast('ok','2FA revoked', username); loadUserDetail(username); }
+        if (j && j.ok){ idle(()=>{ log(`2FA revoked ${username}`); toast('ok','2FA revoked', username); }); patchUserDetail(username, (p)=>{ p.user.two_factor_enabled = false; }); }
         else toast('err','Revoke 2FA failed', j && j.error ? j.error : 'unknown');
       });
 
-      addAction(actMod, 'Suspend', async ()=>{
-        const mins = parseInt((prompt('Suspend minutes (default 60):')||'60').trim(),10) || 60;
-        const reason = prompt('Reason (optional):') || '';
-        const j = await postForm('/admin/suspend_user/' + encodeURIComponent(username), {minutes: mins, reason});
-        if (j && j.ok){ log(`suspended ${username} for ${mins}m`); toast('ok','Suspended', `${username} • ${mins}m`); loadUserDetail(username); }
-        else toast('err','Suspend failed', j && j.error ? j.error : 'unknown');
-      });
-
-      addAction(actMod, 'Mute', async ()=>{
-        const mins = parseInt((prompt('Mute minutes (default 15):')||'15').trim(),10) || 15;
-        const reason = prompt('Reason (optional):') || '';
-        const j = await postForm('/admin/mute_user/' + encodeURIComponent(username), {minutes: mins, reason});
-        if (j && j.ok){ log(`muted ${username} for ${mins}m`); toast('ok','Muted', `${username} • ${mins}m`); loadUserDetail(username); }
-        else toast('err','Mute failed', j && j.error ? j.error : 'unknown');
-      });
-
-      addAction(actMod, 'Set quota', async ()=>{
-        const q = parseInt((prompt('Messages per hour:')||'0').trim(),10);
-        if (!isFinite(q) || q < 0) return toast('warn','Invalid number','Quota must be >= 0');
-        const j = await postForm('/admin/set_user_quota/' + encodeURIComponent(username), {messages_per_hour: q});
-        if (j && j.ok){ log(`quota ${username}=${q}`); toast('ok','Quota updated', `${username} • ${q}/hr`); loadUserDetail(username); }
-        else toast('err','Quota update failed', j && j.error ? j.error : 'unknown');
-      });
-
-      addAction(actMod, 'Set status', async ()=>{
-        const status = (prompt('Presence status (online/away/dnd/offline):')||'').trim();
-        const custom_status = (prompt('Custom status (optional):')||'').trim();
-        if (!status) return;
-        const j = await postForm('/admin/set_user_status/' + encodeURIComponent(username), {presence_status: status, custom_status});
-        if (j && j.ok){ log(`status set ${username}=${status}`); toast('ok','Status updated', `${username} • ${status}`); loadUserDetail(username); }
-        else toast('err','Status update failed', j && j.error ? j.error : 'unknown');
+      // One form for every moderation change: only the fields the admin filled
+      // in are sent, in a single /admin/moderate request.
+      const modForm = modFormTpl.cloneNode(true);
+      addAction(actMod, 'Moderate…', ()=>{
+        modForm.style.display = modForm.style.display === 'none' ? '' : 'none';
       });
-
-      addAction(actMod, 'Assign role', async ()=>{
-        const role = (prompt('Role name (e.g. admin, moderator, viewer):')||'').trim();
-        if (!role) return;
-        const j = await postForm('/admin/assign_role/' + encodeURIComponent(username), {role});
-        if (j && j.ok){ log(`role assigned ${username} -> ${role}`); toast('ok','Role assigned', `${username} • ${role}`); loadUserDetail(username); }
-        else toast('err','Assign role failed', j && j.error ? j.error : 'unknown');
-      });
-
-      addAction(actMod, 'Shadowban', async ()=>{
-        const reason = prompt('Reason (optional):') || '';
-        const j = await postForm('/admin/shadowban_user/' + encodeURIComponent(username), {reason});
-        if (j && j.ok){ log(`shadowban ${username}`); toast('ok','Shadowbanned', username); loadUserDetail(username); }
-        else toast('err','Shadowban failed', j && j.error ? j.error : 'unknown');
+      actMod.appendChild(modForm);
+      modForm.querySelector('[data-act="apply"]').addEventListener('click', async ()=>{
+        const data = {};
+        let changes = 0;
+        for (const inp of modForm.querySelectorAll('[name]')){
+          const v = inp.type === 'checkbox' ? (inp.checked ? '1' : '') : inp.value.trim();
+          if (!v) continue;
+          data[inp.name] = v;
+          if (inp.name !== 'reason') changes++;
+        }
+        if (!changes) return toast('warn','Nothing to apply','Fill in at least one field');
+        invalidateSearchCache();
+        const j = await postForm('/admin/moderate/' + encodeURIComponent(username), data);
+        if (j && j.ok){
+          const applied = (j.applied || []).join(', ');
+          idle(()=>{ log(`moderated ${username}: ${applied}`); toast('ok','Moderation applied', `${username} • ${applied}`); });
+          // New sanctions only exist server-side; quota/status/role are known.
+          if ((j.applied || []).some(a=>a === 'suspend' || a === 'mute' || a === 'shadowban')){
+            loadUserDetail(username, {fresh:true});
+          } else {
+            patchUserDetail(username, (p)=>{
+              if (data.messages_per_hour) p.quota = Object.assign({}, p.quota, {messages_per_hour: +data.messages_per_hour});
+              if (data.status) p.user.custom_status = data.status;
+              else if (data.clear_status) p.user.custom_status = '';
+              if (data.role){
+                const role = data.role.toLowerCase();
+                p.roles = p.roles || [];
+                if (!p.roles.includes(role)) p.roles.push(role);
+              }
+            });
+          }
+        }
+        else toast('err','Moderation failed', j && j.error ? j.error : 'unknown');
       });
 
-      toast('info', 'User loaded', username);
+      if (!quiet) toast('info', 'User loaded', username);
     }
 
-    // ROOMS
-    secRooms.innerHTML = `
-      <div class="ecap-card">
-        <h4>Rooms</h4>
-        <div class="ecap-row">
-          <button id="ecapRoomsReload" class="ecap-btn tight" type="button">Reload</button>
-          <input id="ecapRoomFilter" placeholder="Filter rooms…" />
-        </div>
-        <div class="ecap-list" id="ecapRoomList"></div>
-      </div>
+    // ROOMS (built on first visit to the tab; see setTab)
+    function initRoomsTab(){
+      if (roomsTab) return;
+      secRooms.innerHTML = SEC_ROOMS_HTML;
+
+      const roomList = secRooms.querySelector('#ecapRoomList');
+      const roomRowTpl = secRooms.querySelector('#ecapRoomRowTpl').content.firstElementChild;
+      const roomFilter = secRooms.querySelector('#ecapRoomFilter');
+      let roomsCache = [];
+      let roomFilterShown = '';
+
+      function renderRooms(){
+        const f = (roomFilter.value||'').trim().toLowerCase();
+        roomFilterShown = f;
+        roomList.innerHTML = '';
+        const list = (roomsCache || []).filter(r => !f || safe(r.name).toLowerCase().includes(f));
+        if (!list.length){
+          roomList.innerHTML = '<div class="ecap-item"><span class="ecap-muted">No rooms</span></div>';
+          return;
+        }
+        const frag = document.createDocumentFragment();
+        for (const r of list){
+          const row = roomRowTpl.cloneNode(true);
+          const online = (r && (r.online_count ?? r.online ?? r.members_online));
+          const dbCount = (r && (r.member_count ?? r.members ?? r.count));
+          // Coerce each counter once; the |0 ints are what gets displayed.
+          const onlineNum = +online;
+          const dbNum = +dbCount;
+          const dbInt = dbNum|0;
+          const slow = +r.slowmode_sec || 0;
+
+          let sub;
+          if (isFinite(onlineNum)){
+            const onlineInt = onlineNum|0;
+            sub = `online: ${onlineInt > 0 ? onlineInt : 0}`;
+            // If the persisted counter exists and differs, show it subtly for diagnostics.
+            if (isFinite(dbNum) && dbInt !== onlineInt){
+              sub += ` • db: ${dbInt > 0 ? dbInt : 0}`;
+            }
+          } else {
+            sub = `members: ${dbInt > 0 ? dbInt : 0}`;
+          }
 
-      <div class="ecap-card">
-        <h4>Kick / ban user from room</h4>
-        <div class="ecap-row">
-          <input id="ecapKRUser" placeholder="username" />
-          <input id="ecapKRRoom" placeholder="room" />
-        </div>
-        <div class="ecap-actions">
-          <button id="ecapKickBtn" class="ecap-btn tight" type="button">Kick</button>
-          <button id="ecapRoomBanBtn" class="ecap-btn danger tight" type="button">Room ban</button>
-        </div>
-      </div>
+          row.querySelector('.rname').textContent = safe(r.name);
+          row.querySelector('.rsub').textContent = sub;
+          const pills = row.querySelector('.rpills');
+          if (r.locked) pills.appendChild(pill('bad', 'locked'));
+          if (r.readonly) pills.appendChild(pill('warn', 'readonly'));
+          if (slow > 0) pills.appendChild(pill('', `slow ${slow}s`));
+          if (r.is_custom) pills.appendChild(pill('', 'custom'));
+          if (r.is_custom && r.is_private) pills.appendChild(pill('warn', 'private'));
+          row.querySelector('[data-act="lock"]').textContent = r.locked ? 'Unlock' : 'Lock';
+          row.querySelector('[data-act="ro"]').textContent = r.readonly ? 'Writable' : 'Read-only';
+          if (!r.is_custom) row.querySelector('[data-act="del"]').remove();
+
+          row.dataset.room = r.name;
+          row.dataset.locked = r.locked ? '1' : '0';
+          row.dataset.readonly = r.readonly ? '1' : '0';
+          row.dataset.slow = String(slow);
+          frag.appendChild(row);
+        }
+        roomList.appendChild(frag);
+      }
 
-      <div class="ecap-card">
-        <h4>Broadcast</h4>
-        <textarea id="ecapBroadcast" placeholder="Global announcement…"></textarea>
-        <div class="ecap-row">
-          <button id="ecapBroadcastBtn" class="ecap-btn primary tight" type="button">Send broadcast</button>
-        </div>
-      </div>
-    `;
-
-    const roomList = secRooms.querySelector('#ecapRoomList');
-    const roomFilter = secRooms.querySelector('#ecapRoomFilter');
-    let roomsCache = [];
-
-    function renderRooms(){
-      const f = (roomFilter.value||'').trim().toLowerCase();
-      roomList.innerHTML = '';
-      const list = (roomsCache || []).filter(r => !f || safe(r.name).toLowerCase().includes(f));
-      if (!list.length){
-        roomList.innerHTML = '<div class="ecap-item"><span class="ecap-muted">No rooms</span></div>';
-        return;
+      async function refreshRooms(){
+        applyRooms(await getJSON('/admin/rooms/list'));
       }
-      for (const r of list){
-        const row = el('div', {class:'ecap-item'});
-        const pills = [];
-        if (r.locked) pills.push('<span class="ecap-pill bad">locked</span>');
-        if (r.readonly) pills.push('<span class="ecap-pill warn">readonly</span>');
-        if (r.slowmode_sec && Number(r.slowmode_sec) > 0) pills.push(`<span class="ecap-pill">slow ${Number(r.slowmode_sec)}s</span>`);
-        if (r.is_custom) pills.push('<span class="ecap-pill">custom</span>');
-        if (r.is_custom && r.is_private) pills.push('<span class="ecap-pill warn">private</span>');
-        const online = (r && (r.online_count ?? r.online ?? r.members_online));
-        const dbCount = (r && (r.member_count ?? r.members ?? r.count));
-        const onlineNum = Number(online);
-        const dbNum = Number(dbCount);
-        const showOnline = Number.isFinite(onlineNum);
-        const showDb = Number.isFinite(dbNum);
-
-        let sub = '';
-        if (showOnline){
-          sub = `online: ${safe(String(Math.max(0, onlineNum|0)))}`;
-          // If the persisted counter exists and differs, show it subtly for diagnostics.
-          if (showDb && (dbNum|0) !== (onlineNum|0)){
-            sub += ` • db: ${safe(String(Math.max(0, dbNum|0)))}`;
-          }
-        } else {
-          sub = `members: ${safe(String(Math.max(0, (dbNum|0) || 0)))}`;
+      function applyRooms(j){
+        if (j && j.rooms){
+          roomsCache = j.rooms || [];
+          renderRooms();
         }
+      }
 
-        const delBtn = r.is_custom ? '<button class="ecap-btn danger tight" data-act="del" type="button">Delete</button>' : '';
-
-        row.innerHTML = `<div style="min-width:0">
-          <div style="font-weight:780;white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${safe(r.name)}</div>
-          <div class="ecap-muted">${sub}</div>
-        </div>
-        <div style="display:flex;gap:6px;align-items:center;flex:0 0 auto">
-          ${pills.join(' ')}
-          <button class="ecap-btn tight" data-act="lock" type="button">${r.locked ? 'Unlock':'Lock'}</button>
-          <button class="ecap-btn tight" data-act="ro" type="button">${r.readonly ? 'Writable':'Read-only'}</button>
-          <button class="ecap-btn tight" data-act="sm" type="button">Slow</button>
-          ${delBtn}
-          <button class="ecap-btn danger tight" data-act="clear" type="button">Clear</button>
-        </div>`;
-
-        row.querySelector('[data-act="lock"]').addEventListener('click', async (e)=>{
-          e.stopPropagation();
-          const j = await postForm((r.locked ? '/admin/unlock_room/' : '/admin/lock_room/') + encodeURIComponent(r.name), {});
-          if (j && j.ok){ log(`room ${r.name} lock=${!r.locked}`); toast('ok','Room updated', r.name); refreshRooms(); }
-          else toast('err','Room update failed', j && j.error ? j.error : 'unknown');
-        });
-        row.querySelector('[data-act="ro"]').addEventListener('click', async (e)=>{
-          e.stopPropagation();
-          const j = await postForm('/admin/set_room_readonly/' + encodeURIComponent(r.name), {readonly: r.readonly ? '0':'1'});
-          if (j && j.ok){ log(`room ${r.name} readonly=${!r.readonly}`); toast('ok','Room updated', r.name); refreshRooms(); }
-          else toast('err','Room update failed', j && j.error ? j.error : 'unknown');
-        });
-        row.querySelector('[data-act="sm"]').addEventListener('click', async (e)=>{
-          e.stopPropagation();
-          const cur = Number(r.slowmode_sec || 0) || 0;
-          const raw = prompt(`Slowmode seconds for ${r.name} (0 disables):`, String(cur));
-          if (raw === null) return;
-          const seconds = Math.max(0, Math.min(3600, parseInt(String(raw).trim()||'0',10) || 0));
-          const j = await postForm('/admin/set_room_slowmode/' + encodeURIComponent(r.name), {seconds: String(seconds)});
-          if (j && j.ok){ log(`room slowmode ${r.name}=${seconds}`); toast('ok','Slowmode updated', `${r.name} • ${seconds}s`); refreshRooms(); }
-          else toast('err','Slowmode update failed', j && j.error ? j.error : 'unknown');
-        });
-        row.querySelector('[data-act="clear"]').addEventListener('click', async (e)=>{
-          e.stopPropagation();
-          if (!confirm(`Clear messages in ${r.name}?`)) return;
-          const j = await postForm('/admin/clear_room/' + encodeURIComponent(r.name), {});
-          if (j && j.ok){ log(`cleared room ${r.name}`); toast('ok','Room cleared', r.name); }
-          else toast('err','Clear failed', j && j.error ? j.error : 'unknown');
-        });
-        const delEl = row.querySelector('[data-act="del"]');
-        if (delEl){
-          delEl.addEventListener('click', async (e)=>{
-            e.stopPropagation();
-            if (!confirm(`Delete room "${r.name}"? This cannot be undone.`)) return;
+      // One delegated listener for every room row; rows carry their state in
+      // data-* attributes so re-rendering allocates no per-row handlers.
+      roomList.addEventListener('click', async (e)=>{
+        const row = e.target.closest('.ecap-item');
+        if (!row || !row.dataset.room) return;
+        const name = row.dataset.room;
+        const btn = e.target.closest('[data-act]');
+        if (!btn){
+          secRooms.querySelector('#ecapKRRoom').value = name;
+          return;
+        }
+        e.stopPropagation();
+        const locked = row.dataset.locked === '1';
+        const readonly = row.dataset.readonly === '1';
+        switch (btn.dataset.act){
+          case 'lock': {
+            const j = await postForm((locked ? '/admin/unlock_room/' : '/admin/lock_room/') + encodeURIComponent(name), {});
+            if (j && j.ok){ log(`room ${name} lock=${!locked}`); toast('ok','Room updated', name); refreshRooms(); }
+            else toast('err','Room update failed', j && j.error ? j.error : 'unknown');
+            break;
+          }
+          case 'ro': {
+            const j = await postForm('/admin/set_room_readonly/' + encodeURIComponent(name), {readonly: readonly ? '0':'1'});
+            if (j && j.ok){ log(`room ${name} readonly=${!readonly}`); toast('ok','Room updated', name); refreshRooms(); }
+            else toast('err','Room update failed', j && j.error ? j.error : 'unknown');
+            break;
+          }
+          case 'sm': {
+            const cur = Number(row.dataset.slow) || 0;
+            const raw = prompt(`Slowmode seconds for ${name} (0 disables):`, String(cur));
+            if (raw === null) return;
+            const seconds = Math.max(0, Math.min(3600, parseInt(String(raw).trim()||'0',10) || 0));
+            const j = await postForm('/admin/set_room_slowmode/' + encodeURIComponent(name), {seconds: String(seconds)});
+            if (j && j.ok){ log(`room slowmode ${name}=${seconds}`); toast('ok','Slowmode updated', `${name} • ${seconds}s`); refreshRooms(); }
+            else toast('err','Slowmode update failed', j && j.error ? j.error : 'unknown');
+            break;
+          }
+          case 'clear': {
+            if (!confirm(`Clear messages in ${name}?`)) return;
+            const j = await postForm('/admin/clear_room/' + encodeURIComponent(name), {});
+            if (j && j.ok){ log(`cleared room ${name}`); toast('ok','Room cleared', name); }
+            else toast('err','Clear failed', j && j.error ? j.error : 'unknown');
+            break;
+          }
+          case 'del': {
+            if (!confirm(`Delete room "${name}"? This cannot be undone.`)) return;
             const reason = prompt('Reason (optional):') || '';
-            const j = await postForm('/admin/rooms/delete/' + encodeURIComponent(r.name), {reason});
-            if (j && j.ok){ log(`deleted room ${r.name}`); toast('ok','Room deleted', r.name, 4500); refreshRooms(); }
+            const j = await postForm('/admin/rooms/delete/' + encodeURIComponent(name), {reason});
+            if (j && j.ok){ log(`deleted room ${name}`); toast('ok','Room deleted', name, 4500); refreshRooms(); }
             else toast('err','Delete failed', (j && (j.message || j.error)) ? (j.message || j.error) : 'unknown');
-          });
+            break;
+          }
         }
+      });
 
-        row.addEventListener('click', ()=>{
-          secRooms.querySelector('#ecapKRRoom').value = r.name;
-        });
-        roomList.appendChild(row);
+      secRooms.querySelector('#ecapRoomsReload').addEventListener('click', refreshRooms);
+      // Extending the filter can only hide rows, so a narrowing keystroke just
+      // toggles the rows already rendered instead of rebuilding the list.
+      function filterRooms(){
+        const f = (roomFilter.value||'').trim().toLowerCase();
+        if (!f.startsWith(roomFilterShown)) return renderRooms();
+        let shown = 0;
+        for (const row of roomList.children){
+          const name = row.dataset.room;
+          const hit = name !== undefined && name.toLowerCase().includes(f);
+          row.style.display = hit ? '' : 'none';
+          if (hit) shown++;
+        }
+        if (!shown) return renderRooms();
+        roomFilterShown = f;
       }
-    }
+      roomFilter.addEventListener('input', debounce(filterRooms, 80));
+
+      secRooms.querySelector('#ecapKickBtn').addEventListener('click', async ()=>{
+        const username = (secRooms.querySelector('#ecapKRUser').value||'').trim();
+        const room = (secRooms.querySelector('#ecapKRRoom').value||'').trim();
+        if (!username || !room) return toast('warn','Missing fields','Enter username + room');
+        const j = await postForm('/admin/kick_from_room', {username, room});
+        if (j && j.ok){ log(`kicked ${username} from ${room}`); toast('ok','Kicked', `${username} • ${room}`); }
+        else toast('err','Kick failed', j && j.error ? j.error : 'unknown');
+      });
 
-    async function refreshRooms(){
-      const j = await getJSON('/admin/rooms/list');
-      if (j && j.rooms){
-        roomsCache = j.rooms || [];
-        renderRooms();
-      }
-    }
+      secRooms.querySelector('#ecapRoomBanBtn').addEventListener('click', async ()=>{
+        const username = (secRooms.querySelector('#ecapKRUser').value||'').trim();
+        const room = (secRooms.querySelector('#ecapKRRoom').value||'').trim();
+        if (!username || !room) return toast('warn','Missing fields','Enter username + room');
+        const reason = prompt('Ban reason (optional):') || '';
+        const j = await postForm('/admin/ban_from_room', {username, room, reason});
+        if (j && j.ok){ log(`room ban ${username} in ${room}`); toast('ok','Room-banned', `${username} • ${room}`); }
+        else toast('err','Room ban failed', j && j.error ? j.error : 'unknown');
+      });
 
-    secRooms.querySelector('#ecapRoomsReload').addEventListener('click', refreshRooms);
-    roomFilter.addEventListener('input', debounce(renderRooms, 80));
-    refreshRooms();
-
-    secRooms.querySelector('#ecapKickBtn').addEventListener('click', async ()=>{
-      const username = (secRooms.querySelector('#ecapKRUser').value||'').trim();
-      const room = (secRooms.querySelector('#ecapKRRoom').value||'').trim();
-      if (!username || !room) return toast('warn','Missing fields','Enter username + room');
-      const j = await postForm('/admin/kick_from_room', {username, room});
-      if (j && j.ok){ log(`kicked ${username} from ${room}`); toast('ok','Kicked', `${username} • ${room}`); }
-      else toast('err','Kick failed', j && j.error ? j.error : 'unknown');
-    });
+      secRooms.querySelector('#ecapBroadcastBtn').addEventListener('click', async ()=>{
+        const msg = (secRooms.querySelector('#ecapBroadcast').value||'').trim();
+        if (!msg) return toast('warn','Missing message','Enter a broadcast message');
+        const j = await postForm('/admin/global_broadcast', {message: msg});
+        if (j && j.ok){
+          log(`broadcast delivered=${j.delivered||0}`);
+          toast('ok','Broadcast sent', `delivered=${j.delivered||0}`, 4500);
+          secRooms.querySelector('#ecapBroadcast').value='';
+        } else {
+          toast('err','Broadcast failed', j && j.error ? j.error : 'unknown', 5200);
+        }
+      });
 
-    secRooms.querySelector('#ecapRoomBanBtn').addEventListener('click', async ()=>{
-      const username = (secRooms.querySelector('#ecapKRUser').value||'').trim();
-      const room = (secRooms.querySelector('#ecapKRRoom').value||'').trim();
-      if (!username || !room) return toast('warn','Missing fields','Enter username + room');
-      const reason = prompt('Ban reason (optional):') || '';
-      const j = await postForm('/admin/ban_from_room', {username, room, reason});
-      if (j && j.ok){ log(`room ban ${username} in ${room}`); toast('ok','Room-banned', `${username} • ${room}`); }
-      else toast('err','Room ban failed', j && j.error ? j.error : 'unknown');
-    });
+      roomsTab = {refresh: refreshRooms, apply: applyRooms};
+      refreshRooms();
+    }
 
-    secRooms.querySelector('#ecapBroadcastBtn').addEventListener('click', async ()=>{
-      const msg = (secRooms.querySelector('#ecapBroadcast').value||'').trim();
-      if (!msg) return toast('warn','Missing message','Enter a broadcast message');
-      const j = await postForm('/admin/global_broadcast', {message: msg});
-      if (j && j.ok){
-        log(`broadcast delivered=${j.delivered||0}`);
-        toast('ok','Broadcast sent', `delivered=${j.delivered||0}`, 4500);
-        secRooms.querySelector('#ecapBroadcast').value='';
-      } else {
-        toast('err','Broadcast failed', j && j.error ? j.error : 'unknown', 5200);
+    // SETTINGS (built on first visit to the tab; see setTab)
+    function initSettingsTab(){
+      if (settingsInited) return;
+      settingsInited = true;
+      secSettings.innerHTML = SEC_SETTINGS_HTML;
+
+      const settingsForm = secSettings.querySelector('#ecapSettingsForm');
+      let settingsCache = null;
+      // Server key -> <input>, filled while the form is built; Apply reads these.
+      let settingsInputs = {};
+
+      // Field cards are cloned from the section's <template>s; only the label,
+      // input id and optional hint differ per field.
+      const fieldTpl = {
+        bool: secSettings.querySelector('#ecapFieldBoolTpl').content.firstElementChild,
+        text: secSettings.querySelector('#ecapFieldTextTpl').content.firstElementChild,
+        int: secSettings.querySelector('#ecapFieldIntTpl').content.firstElementChild,
+      };
+      const hintTpl = secSettings.querySelector('#ecapFieldHintTpl').content.firstElementChild;
+      function makeField(label, id, type, hint){
+        const c = (fieldTpl[type] || fieldTpl.int).cloneNode(true);
+        const input = c.querySelector('input');
+        c.querySelector('.ecap-muted').textContent = safe(label);
+        input.id = id;
+        if (hint){
+          const h = hintTpl.cloneNode(true);
+          h.textContent = hint;
+          c.appendChild(h);
+        }
+        return {card: c, input};
       }
-    });
 
-    // SETTINGS
-    secSettings.innerHTML = `
-      <div class="ecap-card">
-        <h4>General settings (super-admin)</h4>
-        <div class="ecap-muted">Persists to settings file. Some changes require clients to reload or a server restart.</div>
-        <div class="ecap-hr"></div>
-        <div class="ecap-grid2" id="ecapSettingsForm"></div>
-        <div class="ecap-hr"></div>
-        <div class="ecap-row">
-          <button id="ecapSettingsReload" class="ecap-btn tight" type="button">Reload</button>
-          <button id="ecapSettingsApply" class="ecap-btn primary tight" type="button">Apply</button>
-        </div>
-      </div>
+      async function loadGeneralSettings(){
+        const j = await getJSON('/admin/settings/general');
+        settingsCache = (j && j.settings) ? j.settings : null;
+        settingsInputs = {};
+        settingsForm.innerHTML = '';
+        if (!settingsCache){
+          settingsForm.innerHTML = '<div class="ecap-muted">Not available (requires super-admin).</div>';
+          return;
+        }
+        // Fill off-DOM and attach once.
+        const frag = document.createDocumentFragment();
+        for (const f of GENERAL_FIELDS){
+          const {card, input: inp} = makeField(f.label, f.id, f.type, f.hint);
+          frag.appendChild(card);
+          settingsInputs[f.key] = inp;
+          const v = settingsCache[f.key];
+          if (f.type === 'bool') inp.checked = !!v;
+          else inp.value = (v === null || v === undefined) ? '' : String(v);
+        }
+        settingsForm.appendChild(frag);
+      }
 
-      <div class="ecap-card" style="margin-top:10px">
-        <h4>GIFs (GIPHY) (super-admin)</h4>
-        <div class="ecap-muted">GIF search uses a server-side proxy. If the key is missing, the GIF modal shows an error. The key is stored in the server settings file.</div>
-        <div class="ecap-hr"></div>
-        <div class="ecap-grid2">
-          <div class="ecap-card" style="margin:0">
-            <div class="ecap-muted">API key</div>
-            <div class="ecap-row" style="margin-top:10px">
-              <input id="ecapGiphyKey" type="password" placeholder="Paste GIPHY key…" />
-              <button id="ecapGiphyShow" class="ecap-btn tight" type="button">Show</button>
-            </div>
-            <div class="ecap-muted" style="margin-top:8px">Status: <b id="ecapGiphyKeyStatus" style="font-weight:780">—</b></div>
-          </div>
-          <div class="ecap-card" style="margin:0">
-            <div class="ecap-muted">Search policy</div>
-            <div class="ecap-row" style="margin-top:10px">
-              <input id="ecapGiphyRating" placeholder="pg-13" />
-              <input id="ecapGiphyLang" placeholder="en" />
-              <input id="ecapGiphyLimit" inputmode="numeric" placeholder="24" />
-            </div>
-            <div class="ecap-muted" style="margin-top:8px">rating / language / default limit</div>
-          </div>
-        </div>
-        <div class="ecap-hr"></div>
-        <div class="ecap-row">
-          <button id="ecapGiphyReload" class="ecap-btn tight" type="button">Reload</button>
-          <button id="ecapGiphyApply" class="ecap-btn primary tight" type="button">Apply</button>
-        </div>
-      </div>
+      async function applyGeneralSettings(){
+        if (!settingsCache) return toast('warn','Not available','Requires super-admin');
+        const payload = {};
+        function grabBool(key){
+          const elx = settingsInputs[key];
+          if (!elx) return;
+          payload[key] = !!elx.checked;
+        }
+        function grabInt(key){
+          const elx = settingsInputs[key];
+          if (!elx) return;
+          const v = (elx.value||'').trim();
+          if (v === '') return;
+          payload[key] = parseInt(v,10);
+        }
 
-      <div class="ecap-card" style="margin-top:10px">
-        <h4>Anti-abuse (super-admin)</h4>
-        <div class="ecap-muted">Updates apply immediately on server. Be careful with very low windows/limits.</div>
-        <div class="ecap-hr"></div>
-        <div class="ecap-grid2" id="ecapAntiForm"></div>
-        <div class="ecap-hr"></div>
-        <div class="ecap-row">
-          <button id="ecapAntiReload" class="ecap-btn tight" type="button">Reload</button>
-          <button id="ecapAntiApply" class="ecap-btn primary tight" type="button">Apply</button>
-        </div>
-      </div>
-    `;
-
-    const settingsForm = secSettings.querySelector('#ecapSettingsForm');
-    let settingsCache = null;
-
-    function makeField(label, id, type, hint){
-      const c = el('div', {class:'ecap-card', style:'margin:0'});
-      const h = hint ? `<div class="ecap-muted" style="margin-top:6px">${safe(hint)}</div>` : '';
-      if (type === 'bool'){
-        c.innerHTML = `<div style="display:flex;align-items:center;justify-content:space-between;gap:10px">
-          <div style="min-width:0">
-            <div class="ecap-muted">${safe(label)}</div>
-          </div>
-          <input id="${id}" type="checkbox" style="width:auto" />
-        </div>${h}`;
-      } else if (type === 'text'){
-        c.innerHTML = `<div class="ecap-muted">${safe(label)}</div><input id="${id}" placeholder="" />${h}`;
-      } else {
-        c.innerHTML = `<div class="ecap-muted">${safe(label)}</div><input id="${id}" inputmode="numeric" placeholder="" />${h}`;
+        GENERAL_BOOL_KEYS.forEach(grabBool);
+        GENERAL_INT_KEYS.forEach(grabInt);
+
+        const j = await postJSON('/admin/settings/general', payload);
+        if (j && j.ok){
+          log(`settings patch persisted=${j.persisted}`);
+          toast('ok','Settings applied', `persisted=${j.persisted}`);
+          // The form already shows what was sent; only re-read from the
+          // server when it says the patch was not persisted.
+          Object.assign(settingsCache, payload);
+          if (j.persisted === false) loadGeneralSettings();
+          refreshStats();
+        } else {
+          toast('err','Settings apply failed', j && j.error ? j.error : 'unknown', 5200);
+        }
       }
-      return c;
-    }
 
-    async function loadGeneralSettings(){
-      const j = await getJSON('/admin/settings/general');
-      settingsCache = (j && j.settings) ? j.settings : null;
-      settingsForm.innerHTML = '';
-      if (!settingsCache){
-        settingsForm.innerHTML = '<div class="ecap-muted">Not available (requires super-admin).</div>';
-        return;
-      }
-      const fields = [
-        ['Voice enabled','set_voice_enabled','bool',''],
-        ['P2P file enabled','set_p2p_file_enabled','bool',''],
-        ['Giphy enabled','set_giphy_enabled','bool',''],
-        ['Disable file transfer (global)','set_disable_file_transfer_globally','bool',''],
-        ['Disable group files (global)','set_disable_group_files_globally','bool',''],
-        ['Require DM E2EE','set_require_dm_e2ee','bool',''],
-        ['Allow plaintext DM fallback','set_allow_plaintext_dm_fallback','bool',''],
-        ['Max message length (chars)','set_max_message_length','int',''],
-        ['Max attachment size (bytes)','set_max_attachment_size','int',''],
-        ['Max DM file bytes','set_max_dm_file_bytes','int',''],
-        ['Max group upload bytes','set_max_group_upload_bytes','int',''],
-        ['Group msg rate limit','set_group_msg_rate_limit','int','messages per window'],
-        ['Group msg window seconds','set_group_msg_rate_window_sec','int',''],
-
-        // Background cleanup / TTL
-        ['Custom room idle hours (public)','set_custom_room_idle_hours','int','Empty custom rooms are auto-deleted after this many hours'],
-        ['Custom room idle hours (private)','set_custom_private_room_idle_hours','int','Private rooms are usually more ephemeral (default 24h)'],
-        ['Janitor interval (seconds)','set_janitor_interval_seconds','int','How often cleanup runs (10..3600)']
-      ];
-      for (const [label,key,typ,hint] of fields){
-        const id = key;
-        settingsForm.appendChild(makeField(label, id, typ, hint));
-        const realKey = key.replace('set_','');
-        const v = settingsCache[realKey];
-        const inp = secSettings.querySelector('#'+id);
-        if (!inp) continue;
-        if (typ === 'bool') inp.checked = !!v;
-        else inp.value = (v === null || v === undefined) ? '' : String(v);
+      secSettings.querySelector('#ecapSettingsReload').addEventListener('click', loadGeneralSettings);
+      secSettings.querySelector('#ecapSettingsApply').addEventListener('click', applyGeneralSettings);
+
+      // GIF SETTINGS (GIPHY)
+      const giphyKeyInput = secSettings.querySelector('#ecapGiphyKey');
+      const giphyShowBtn = secSettings.querySelector('#ecapGiphyShow');
+      const giphyStatus = secSettings.querySelector('#ecapGiphyKeyStatus');
+      const giphyRating = secSettings.querySelector('#ecapGiphyRating');
+      const giphyLang = secSettings.querySelector('#ecapGiphyLang');
+      const giphyLimit = secSettings.querySelector('#ecapGiphyLimit');
+
+      async function loadGifSettings(){
+        const j = await getJSON('/admin/settings/gifs');
+        if (!j || !j.ok){
+          if (giphyStatus) giphyStatus.textContent = 'unavailable';
+          return;
+        }
+        if (giphyStatus) giphyStatus.textContent = j.has_key ? 'set' : 'missing';
+        if (giphyRating) giphyRating.value = String(j.giphy_rating || 'pg-13');
+        if (giphyLang) giphyLang.value = String(j.giphy_lang || 'en');
+        if (giphyLimit) giphyLimit.value = String(j.giphy_default_limit || 24);
+        if (giphyKeyInput) giphyKeyInput.value = '';
       }
-    }
 
-    async function applyGeneralSettings(){
-      if (!settingsCache) return toast('warn','Not available','Requires super-admin');
-      const payload = {};
-      function grabBool(key){
-        const id = 'set_'+key;
-        const elx = secSettings.querySelector('#'+id);
-        if (!elx) return;
-        payload[key] = !!elx.checked;
-      }
-      function grabInt(key){
-        const id = 'set_'+key;
-        const elx = secSettings.querySelector('#'+id);
-        if (!elx) return;
-        const v = (elx.value||'').trim();
-        if (v === '') return;
-        payload[key] = parseInt(v,10);
+      async function applyGifSettings(){
+        const payload = {};
+        if (giphyRating) payload.giphy_rating = (giphyRating.value||'').trim() || 'pg-13';
+        if (giphyLang) payload.giphy_lang = (giphyLang.value||'').trim() || 'en';
+        if (giphyLimit){
+          const v = (giphyLimit.value||'').trim();
+          if (v !== '') payload.giphy_default_limit = parseInt(v,10);
+        }
+        if (giphyKeyInput){
+          const k = (giphyKeyInput.value||'').trim();
+          if (k !== '') payload.giphy_api_key = k;
+        }
+        const j = await postJSON('/admin/settings/gifs', payload);
+        if (j && j.ok){
+          toast('ok','GIF settings saved', `persisted=${j.persisted} key=${j.has_key?'set':'missing'}`);
+          if (j.persisted === false) loadGifSettings();
+          else {
+            if (giphyStatus) giphyStatus.textContent = j.has_key ? 'set' : 'missing';
+            if (giphyKeyInput) giphyKeyInput.value = '';
+          }
+          refreshStats();
+        } else {
+          toast('err','GIF settings failed', (j && j.error) ? j.error : 'unknown', 5200);
+        }
       }
 
-      ['voice_enabled','p2p_file_enabled','giphy_enabled','disable_file_transfer_globally','disable_group_files_globally','require_dm_e2ee','allow_plaintext_dm_fallback'].forEach(grabBool);
-      ['max_message_length','max_attachment_size','max_dm_file_bytes','max_group_upload_bytes','group_msg_rate_limit','group_msg_rate_window_sec','custom_room_idle_hours','custom_private_room_idle_hours','janitor_interval_seconds'].forEach(grabInt);
-
-      const j = await postJSON('/admin/settings/general', payload);
-      if (j && j.ok){
-        log(`settings patch persisted=${j.persisted}`);
-        toast('ok','Settings applied', `persisted=${j.persisted}`);
-        loadGeneralSettings();
-        refreshStats();
-      } else {
-        toast('err','Settings apply failed', j && j.error ? j.error : 'unknown', 5200);
+      if (giphyShowBtn && giphyKeyInput){
+        giphyShowBtn.addEventListener('click', ()=>{
+          const isPw = giphyKeyInput.type === 'password';
+          giphyKeyInput.type = isPw ? 'text' : 'password';
+          giphyShowBtn.textContent = isPw ? 'Hide' : 'Show';
+        });
       }
-    }
 
-    secSettings.querySelector('#ecapSettingsReload').addEventListener('click', loadGeneralSettings);
-    secSettings.querySelector('#ecapSettingsApply').addEventListener('click', applyGeneralSettings);
-    loadGeneralSettings();
-
-    // GIF SETTINGS (GIPHY)
-    const giphyKeyInput = secSettings.querySelector('#ecapGiphyKey');
-    const giphyShowBtn = secSettings.querySelector('#ecapGiphyShow');
-    const giphyStatus = secSettings.querySelector('#ecapGiphyKeyStatus');
-    const giphyRating = secSettings.querySelector('#ecapGiphyRating');
-    const giphyLang = secSettings.querySelector('#ecapGiphyLang');
-    const giphyLimit = secSettings.querySelector('#ecapGiphyLimit');
-
-    async function loadGifSettings(){
-      const j = await getJSON('/admin/settings/gifs');
-      if (!j || !j.ok){
-        if (giphyStatus) giphyStatus.textContent = 'unavailable';
-        return;
-      }
-      if (giphyStatus) giphyStatus.textContent = j.has_key ? 'set' : 'missing';
-      if (giphyRating) giphyRating.value = String(j.giphy_rating || 'pg-13');
-      if (giphyLang) giphyLang.value = String(j.giphy_lang || 'en');
-      if (giphyLimit) giphyLimit.value = String(j.giphy_default_limit || 24);
-      if (giphyKeyInput) giphyKeyInput.value = '';
-    }
+      secSettings.querySelector('#ecapGiphyReload')?.addEventListener('click', loadGifSettings);
+      secSettings.querySelector('#ecapGiphyApply')?.addEventListener('click', applyGifSettings);
+
+      // ANTI-ABUSE SETTINGS
+      const antiForm = secSettings.querySelector('#ecapAntiForm');
+      let antiCache = null;
+      let antiInputs = {};
+
+      async function loadAntiAbuseSettings(){
+        const j = await getJSON('/admin/settings/antiabuse');
+        antiCache = (j && j.settings) ? j.settings : null;
+        antiInputs = {};
+        antiForm.innerHTML = '';
+        if (!antiCache){
+          antiForm.innerHTML = '<div class="ecap-muted">Not available (requires super-admin).</div>';
+          return;
+        }
 
-    async function applyGifSettings(){
-      const payload = {};
-      if (giphyRating) payload.giphy_rating = (giphyRating.value||'').trim() || 'pg-13';
-      if (giphyLang) payload.giphy_lang = (giphyLang.value||'').trim() || 'en';
-      if (giphyLimit){
-        const v = (giphyLimit.value||'').trim();
-        if (v !== '') payload.giphy_default_limit = parseInt(v,10);
-      }
-      if (giphyKeyInput){
-        const k = (giphyKeyInput.value||'').trim();
-        if (k !== '') payload.giphy_api_key = k;
-      }
-      const j = await postJSON('/admin/settings/gifs', payload);
-      if (j && j.ok){
-        toast('ok','GIF settings saved', `persisted=${j.persisted} key=${j.has_key?'set':'missing'}`);
-        loadGifSettings();
-        refreshStats();
-      } else {
-        toast('err','GIF settings failed', (j && j.error) ? j.error : 'unknown', 5200);
+        // Fill off-DOM and attach once.
+        const frag = document.createDocumentFragment();
+        for (const f of ANTI_FIELDS){
+          const {card, input: inp} = makeField(f.label, f.id, f.type, f.hint);
+          frag.appendChild(card);
+          antiInputs[f.key] = inp;
+          const v = antiCache[f.key];
+          if (f.type === 'bool') inp.checked = !!v;
+          else inp.value = (v === null || v === undefined) ? '' : String(v);
+        }
+        antiForm.appendChild(frag);
       }
-    }
 
-    if (giphyShowBtn && giphyKeyInput){
-      giphyShowBtn.addEventListener('click', ()=>{
-        const isPw = giphyKeyInput.type === 'password';
-        giphyKeyInput.type = isPw ? 'text' : 'password';
-        giphyShowBtn.textContent = isPw ? 'Hide' : 'Show';
-      });
-    }
-
-    secSettings.querySelector('#ecapGiphyReload')?.addEventListener('click', loadGifSettings);
-    secSettings.querySelector('#ecapGiphyApply')?.addEventListener('click', applyGifSettings);
-    loadGifSettings();
+      async function applyAntiAbuseSettings(){
+        if (!antiCache) return toast('warn','Not available','Requires super-admin');
+        const payload = {};
+        function grabBool(realKey){
+          const elx = antiInputs[realKey];
+          if (!elx) return;
+          payload[realKey] = !!elx.checked;
+        }
+        function grabInt(realKey){
+          const elx = antiInputs[realKey];
+          if (!elx) return;
+          const v = (elx.value||'').trim();
+          if (v === '') return;
+          payload[realKey] = parseInt(v,10);
+        }
+        function grabText(realKey){
+          const elx = antiInputs[realKey];
+          if (!elx) return;
+          const v = (elx.value||'').trim();
+          if (v === '') return;
+          payload[realKey] = v;
+        }
 
-    // ANTI-ABUSE SETTINGS
-    const antiForm = secSettings.querySelector('#ecapAntiForm');
-    let antiCache = null;
+        ANTI_BOOL_KEYS.forEach(grabBool);
+        ANTI_INT_KEYS.forEach(grabInt);
+        ANTI_TEXT_KEYS.forEach(grabText);
 
-    async function loadAntiAbuseSettings(){
-      const j = await getJSON('/admin/settings/antiabuse');
-      antiCache = (j && j.settings) ? j.settings : null;
-      antiForm.innerHTML = '';
-      if (!antiCache){
-        antiForm.innerHTML = '<div class="ecap-muted">Not available (requires super-admin).</div>';
-        return;
-      }
-      const fields = [
-        ['Room msg rate limit','anti_room_msg_rate_limit','text','Format: "N@seconds" (example 20@10)'],
-        ['Room msg window seconds','anti_room_msg_rate_window_sec','int',''],
-        ['DM msg rate limit','anti_dm_msg_rate_limit','text','Format: "N@seconds"'],
-        ['DM msg window seconds','anti_dm_msg_rate_window_sec','int',''],
-        ['File offer rate limit','anti_file_offer_rate_limit','text','Format: "N@seconds"'],
-        ['File offer window seconds','anti_file_offer_rate_window_sec','int',''],
-        ['Default room slowmode (sec)','anti_room_slowmode_default_sec','int',''],
-        ['Strikes before auto-mute','anti_antiabuse_strikes_before_mute','int',''],
-        ['Strike window (sec)','anti_antiabuse_strike_window_sec','int',''],
-        ['Auto-mute minutes','anti_antiabuse_auto_mute_minutes','int',''],
-        ['Join rate limit','anti_room_join_rate_limit','text','Format: "N@seconds"'],
-        ['Join window seconds','anti_room_join_rate_window_sec','int',''],
-        ['Room create rate limit','anti_room_create_rate_limit','text','Format: "N@seconds"'],
-        ['Room create window seconds','anti_room_create_rate_window_sec','int',''],
-        ['Allow users to create rooms','anti_allow_user_create_rooms','bool',''],
-        ['Max room name length','anti_max_room_name_length','int',''],
-        ['Friend request rate limit','anti_friend_req_rate_limit','text','Format: "N@seconds"'],
-        ['Friend request window seconds','anti_friend_req_rate_window_sec','int',''],
-        ['Friend unique targets max','anti_friend_req_unique_targets_max','int',''],
-        ['Friend unique targets window','anti_friend_req_unique_targets_window_sec','int',''],
-        ['Max links per message','anti_max_links_per_message','int',''],
-        ['Max magnets per message','anti_max_magnets_per_message','int',''],
-        ['Max mentions per message','anti_max_mentions_per_message','int',''],
-        ['Dup msg window (sec)','anti_dup_msg_window_sec','int',''],
-        ['Dup msg max repeats','anti_dup_msg_max','int',''],
-        ['Dup msg min length','anti_dup_msg_min_length','int',''],
-        ['Normalize dup compare','anti_dup_msg_normalize','bool','Lowercase + collapse spaces']
-      ];
-
-      for (const [label,key,typ,hint] of fields){
-        antiForm.appendChild(makeField(label, key, typ, hint));
-        const realKey = key.replace('anti_','');
-        const v = antiCache[realKey];
-        const inp = secSettings.querySelector('#'+key);
-        if (!inp) continue;
-        if (typ === 'bool') inp.checked = !!v;
-        else inp.value = (v === null || v === undefined) ? '' : String(v);
+        const j = await postJSON('/admin/settings/antiabuse', payload);
+        if (j && j.ok){
+          log(`antiabuse patch persisted=${j.persisted}`);
+          toast('ok','Anti-abuse applied', `persisted=${j.persisted}`);
+          Object.assign(antiCache, payload);
+          if (j.persisted === false) loadAntiAbuseSettings();
+        } else {
+          toast('err','Anti-abuse apply failed', j && j.error ? j.error : 'unknown', 5200);
+        }
       }
-    }
 
-    async function applyAntiAbuseSettings(){
-      if (!antiCache) return toast('warn','Not available','Requires super-admin');
-      const payload = {};
-      function grabBool(realKey){
-        const id = 'anti_'+realKey;
-        const elx = secSettings.querySelector('#'+id);
-        if (!elx) return;
-        payload[realKey] = !!elx.checked;
-      }
-      function grabInt(realKey){
-        const id = 'anti_'+realKey;
-        const elx = secSettings.querySelector('#'+id);
-        if (!elx) return;
-        const v = (elx.value||'').trim();
-        if (v === '') return;
-        payload[realKey] = parseInt(v,10);
-      }
-      function grabText(realKey){
-        const id = 'anti_'+realKey;
-        const elx = secSettings.querySelector('#'+id);
-        if (!elx) return;
-        const v = (elx.value||'').trim();
-        if (v === '') return;
-        payload[realKey] = v;
-      }
+      secSettings.querySelector('#ecapAntiReload').addEventListener('click', loadAntiAbuseSettings);
+      secSettings.querySelector('#ecapAntiApply').addEventListener('click', applyAntiAbuseSettings);
 
-      ['allow_user_create_rooms','dup_msg_normalize'].forEach(grabBool);
-      [
-        'room_msg_rate_window_sec','dm_msg_rate_window_sec','file_offer_rate_window_sec','room_slowmode_default_sec',
-        'antiabuse_strikes_before_mute','antiabuse_strike_window_sec','antiabuse_auto_mute_minutes',
-        'room_join_rate_window_sec','room_create_rate_window_sec','max_room_name_length',
-        'friend_req_rate_window_sec','friend_req_unique_targets_max','friend_req_unique_targets_window_sec',
-        'max_links_per_message','max_magnets_per_message','max_mentions_per_message',
-        'dup_msg_window_sec','dup_msg_max','dup_msg_min_length'
-      ].forEach(grabInt);
-      [
-        'room_msg_rate_limit','dm_msg_rate_limit','file_offer_rate_limit','room_join_rate_limit','room_create_rate_limit','friend_req_rate_limit'
-      ].forEach(grabText);
-
-      const j = await postJSON('/admin/settings/antiabuse', payload);
-      if (j && j.ok){
-        log(`antiabuse patch persisted=${j.persisted}`);
-        toast('ok','Anti-abuse applied', `persisted=${j.persisted}`);
-        loadAntiAbuseSettings();
-      } else {
-        toast('err','Anti-abuse apply failed', j && j.error ? j.error : 'unknown', 5200);
-      }
+      Promise.allSettled([loadGeneralSettings(), loadGifSettings(), loadAntiAbuseSettings()]).then(rs=>{
+        for (const r of rs) if (r.status === 'rejected') log(`ERROR settings load: ${r.reason}`);
+      });
     }
 
-    secSettings.querySelector('#ecapAntiReload').addEventListener('click', loadAntiAbuseSettings);
-    secSettings.querySelector('#ecapAntiApply').addEventListener('click', applyAntiAbuseSettings);
-    loadAntiAbuseSettings();
-
     // AUDIT
-    secAudit.innerHTML = `
-      <div class="ecap-card ecap-fill ecap-fillCol" style="gap:8px">
-        <h4>Audit log</h4>
-        <div class="ecap-row">
-          <input id="ecapAuditQ" placeholder="Filter (actor, action, target, details)…" />
-          <button id="ecapAuditRefresh" class="ecap-btn tight" type="button">Refresh</button>
-        </div>
-        <div class="ecap-list ecap-fillScroll" id="ecapAuditList"></div>
-      </div>
-    `;
+    secAudit.innerHTML = SEC_AUDIT_HTML;
 
     const auditQ = secAudit.querySelector('#ecapAuditQ');
     const auditList = secAudit.querySelector('#ecapAuditList');
 
-    async function refreshAudit(){
+    // Audit rows by event key. An unchanged event keeps its node across
+    // refreshes; a changed one only has its text slots rewritten.
+    let auditRows = new Map();
+    const auditRowTpl = secAudit.querySelector('#ecapAuditRowTpl').content.firstElementChild;
+    function makeAuditRow(){
+      const row = auditRowTpl.cloneNode(true);
+      return {
+        row, sig: null,
+        action: row.querySelector('.raction'),
+        ts: row.querySelector('.rts'),
+        who: row.querySelector('.rwho'),
+        details: row.querySelector('.rdetails'),
+      };
+    }
+
+    // Recent audit pages by query (2s TTL, 8 entries, least recently used
+    // first), so typing a query and deleting it again does not refetch.
+    const AUDIT_CACHE_TTL = 2000;
+    const auditCache = new Map();
+    async function refreshAudit(fresh){
       const q = (auditQ.value||'').trim();
-      const qs = new URLSearchParams({q, limit:'80'}).toString();
-      const j = await getJSON('/admin/audit/recent?'+qs);
-      auditList.innerHTML = '';
+      const hit = auditCache.get(q);
+      if (hit && fresh !== true && Date.now() - hit.t < AUDIT_CACHE_TTL){
+        auditCache.delete(q);
+        auditCache.set(q, hit);
+        renderAudit(hit.j);
+        return;
+      }
+      const j = await getJSON('/admin/audit/recent?q=' + encodeURIComponent(q) + '&limit=80');
+      if (j && j.ok !== false){
+        auditCache.delete(q);
+        auditCache.set(q, {t: Date.now(), j});
+        if (auditCache.size > 8) auditCache.delete(auditCache.keys().next().value);
+      }
+      // A newer query may have been typed while this one was in flight.
+      if ((auditQ.value||'').trim() === q) renderAudit(j);
+    }
+
+    function renderAudit(j){
       const ev = (j && j.events) ? j.events : [];
       if (!ev.length){
+        auditRows = new Map();
         auditList.innerHTML = '<div class="ecap-item"><span class="ecap-muted">No events</span></div>';
         return;
       }
+      const next = new Map();
+      const seen = new Map();
       for (const e of ev){
-        const row = el('div', {class:'ecap-item'});
-        const ts = e.timestamp ? new Date(e.timestamp).toLocaleString() : '';
-        const details = safe(e.details || '');
-        row.innerHTML = `<div style="min-width:0">
-          <div style="font-weight:750;white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${safe(e.action)} <span class="ecap-muted">(${safe(ts)})</span></div>
-          <div class="ecap-muted" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis">actor: ${safe(e.actor)} • target: ${safe(e.target || '—')}</div>
-          <div class="ecap-muted" style="white-space:nowrap;overflow:hidden;text-overflow:ellipsis">${details}</div>
-        </div>`;
-        auditList.appendChild(row);
+        // No event id is exposed; identical keys in one page get a counter.
+        const base = `${e.timestamp}|${e.actor}|${e.action}|${e.target}`;
+        const n = seen.get(base) || 0;
+        seen.set(base, n + 1);
+        const key = n ? `${base}#${n}` : base;
+        const sig = safe(e.details);
+        const r = auditRows.get(key) || makeAuditRow();
+        next.set(key, r);
+        if (r.sig !== sig){
+          r.sig = sig;
+          r.action.textContent = safe(e.action);
+          r.ts.textContent = `(${e.timestamp ? new Date(e.timestamp).toLocaleString() : ''})`;
+          r.who.textContent = `actor: ${safe(e.actor)} • target: ${safe(e.target || '—')}`;
+          r.details.textContent = sig;
+        }
       }
+      auditRows = next;
+      // Moves kept rows into the new order and drops everything else.
+      auditList.replaceChildren(...Array.from(next.values(), r=>r.row));
     }
-    secAudit.querySelector('#ecapAuditRefresh').addEventListener('click', refreshAudit);
-    auditQ.addEventListener('input', debounce(refreshAudit, 260));
-    refreshAudit();
-
-    // Make user list items draggable (best-effort; external DOM)
-    function enableDraggableUsers(){
-      const lists = [document.getElementById('userList'), document.getElementById('friendsList')].filter(Boolean);
-      for (const ul of lists){
-        ul.querySelectorAll('li').forEach(li=>{
-          if (li.getAttribute('data-ecap-draggable') === '1') return;
-          const text = (li.textContent||'').trim();
-          if (!text) return;
-          li.setAttribute('draggable','true');
-          li.setAttribute('data-ecap-draggable','1');
-          li.addEventListener('dragstart', (e)=>{
-            e.dataTransfer.setData('text/plain', text.split('\n')[0].trim());
-          });
-        });
+    secAudit.querySelector('#ecapAuditRefresh').addEventListener('click', ()=>refreshAudit(true));
+    auditQ.addEventListener('input', debounce(()=>refreshAudit(), 260));
+
+    // Make user list items draggable (best-effort; external DOM). Each list is
+    // watched with a MutationObserver, so only added/changed <li>s are touched.
+    function makeDraggable(li){
+      if (li.getAttribute('data-ecap-draggable') === '1') return;
+      const text = (li.textContent||'').trim();
+      if (!text) return;
+      li.setAttribute('draggable','true');
+      li.setAttribute('data-ecap-draggable','1');
+      li.addEventListener('dragstart', (e)=>{
+        e.dataTransfer.setData('text/plain', text.split('\n')[0].trim());
+      });
+    }
+    function onUserListMutations(muts){
+      for (const m of muts){
+        // An <li> may be inserted empty and filled in afterwards.
+        const host = m.target.nodeType === 1 ? m.target.closest('li') : null;
+        if (host) makeDraggable(host);
+        for (const n of m.addedNodes){
+          if (n.nodeName === 'LI') makeDraggable(n);
+        }
+      }
+    }
+    const watchedUserLists = new Set();
+    function watchUserLists(){
+      for (const id of ['userList', 'friendsList']){
+        const ul = document.getElementById(id);
+        if (!ul || watchedUserLists.has(ul)) continue;
+        watchedUserLists.add(ul);
+        ul.querySelectorAll('li').forEach(makeDraggable);
+        const mo = new MutationObserver(onUserListMutations);
+        mo.observe(ul, {childList:true, subtree:true});
+        onPanelTeardown(()=>mo.disconnect());
+      }
+      return watchedUserLists.size >= 2;
+    }
+    // The chat UI may render its lists after the panel boots; look for them
+    // until both are found.
+    if (!watchUserLists()){
+      const listWait = setInterval(()=>{ if (watchUserLists()) clearInterval(listWait); }, 1500);
+      onPanelTeardown(()=>clearInterval(listWait));
+    }
+
+    // Online roster buttons are kept and relabelled across stats refreshes
+    // (at most 24); one delegated listener serves all of them.
+    const onlineWrap = secDash.querySelector('#ecapOnlineList');
+    const onlineBtns = [];
+    const onlineEmpty = el('span', {class:'ecap-muted', text:'No live roster available.'});
+    const onlineMore = el('span', {class:'ecap-muted'});
+    onlineWrap.append(onlineEmpty, onlineMore);
+    onlineWrap.addEventListener('click', (e)=>{
+      const b = e.target.closest('button[data-username]');
+      if (!b) return;
+      setTargetUser(b.dataset.username, {syncInput:true, loadDetail:true});
+      setTab('users');
+    });
+
+    function renderOnlineList(all){
+      const users = all.slice(0, 24);
+      while (onlineBtns.length < users.length){
+        const b = document.createElement('button');
+        b.className = 'ecap-btn tight';
+        b.type = 'button';
+        onlineWrap.insertBefore(b, onlineEmpty);
+        onlineBtns.push(b);
       }
+      for (let i = 0; i < onlineBtns.length; i++){
+        const b = onlineBtns[i];
+        const u = users[i];
+        b.hidden = u === undefined;
+        if (u !== undefined && b.dataset.username !== u){
+          b.dataset.username = u;
+          b.textContent = u;
+        }
+      }
+      onlineEmpty.hidden = users.length > 0;
+      onlineMore.hidden = all.length <= users.length;
+      if (!onlineMore.hidden) onlineMore.textContent = `+${all.length-users.length} more`;
     }
-    setInterval(enableDraggableUsers, 1500);
 
     // Stats refresh
     async function refreshStats(){
-      const j = await getJSON('/admin/stats');
+      renderStats(await getJSON('/admin/stats'));
+    }
+    function renderStats(j){
       if (!j || j.ok === false){
         dot.classList.remove('ok'); dot.classList.add('bad');
         toast('err','Admin API unavailable', (j && j.error) ? j.error : 'unknown', 5200);
@@ -1852,38 +2361,14 @@ def build_admin_injection_snippet() -> str:
       if (vRooms) vRooms.textContent = String(j.voice_rooms ?? '—');
       if (vUsers) vUsers.textContent = String(j.voice_total_users ?? '—');
 
-      // Online list
-      const onlineWrap = document.getElementById('ecapOnlineList');
-      if (onlineWrap){
-        onlineWrap.innerHTML = '';
-        const users = (j.online_usernames || []).slice(0, 24);
-        if (!users.length){
-          onlineWrap.innerHTML = '<span class="ecap-muted">No live roster available.</span>';
-        } else {
-          for (const u of users){
-            const b = el('button', {class:'ecap-btn tight', text:u, type:'button'});
-            b.addEventListener('click', ()=>{
-              setTargetUser(u, {syncInput:true, loadDetail:true});
-              setTab('users');
-            });
-            onlineWrap.appendChild(b);
-          }
-          if (j.online_usernames.length > users.length){
-            const more = el('span', {class:'ecap-muted', text:`+${j.online_usernames.length-users.length} more`});
-            onlineWrap.appendChild(more);
-          }
-        }
-      }
+      renderOnlineList(j.online_usernames || []);
 
       // Feature pills
       const pillWrap = document.getElementById('ecapFeaturePills');
       if (pillWrap){
         pillWrap.innerHTML = '';
         const snap = j.settings_snapshot || {};
-        const mk = (label, ok, cls)=>{
-          const s = el('span', {class:`ecap-pill ${cls || (ok?'ok':'bad')}`, text: label});
-          pillWrap.appendChild(s);
-        };
+        const mk = (label, ok, cls)=>pillWrap.appendChild(pill(cls || (ok?'ok':'bad'), label));
         mk(`voice ${snap.voice_enabled ? 'on':'off'}`, !!snap.voice_enabled);
         mk(`giphy ${snap.giphy_enabled ? 'on':'off'}`, !!snap.giphy_enabled);
         mk(`p2p ${snap.p2p_file_enabled ? 'on':'off'}`, !!snap.p2p_file_enabled);
@@ -1894,29 +2379,66 @@ def build_admin_injection_snippet() -> str:
       }
     }
 
-    btnRefresh.addEventListener('click', ()=>{
-      refreshStats();
-      refreshRooms();
-      refreshAudit();
-      runSearch();
-      refreshVoiceSettings();
-      toast('info','Refreshed','Stats + lists updated');
-      log('manual refresh');
-    });
+    // Stats, voice and (once that tab is built) rooms in one request. With
+    // `withLists` the audit page and the current user search ride along, so a
+    // manual refresh is a single round trip. Falls back to the individual
+    // endpoints when the server has no /admin/bulk.
+    async function refreshBulk(withLists){
+      let url = roomsTab ? '/admin/bulk?ops=stats,voice,rooms' : '/admin/bulk?ops=stats,voice';
+      const sr = withLists ? searchRequest() : null;
+      if (withLists){
+        url += (sr ? ',audit,search' : ',audit') + '&audit.limit=80&audit.q=' + encodeURIComponent((auditQ.value||'').trim());
+        if (sr) url += '&' + sr.qs.replace(/(^|&)/g, '$1search.');
+      }
+      const b = await getJSON(url);
+      if (!b || b.ok === false || !b.stats){
+        refreshVoiceSettings();
+        refreshStats();
+        if (roomsTab) roomsTab.refresh();
+        if (withLists) idle(()=>{ refreshAudit(true); runSearch(); });
+        return;
+      }
+      applyVoiceSettings(b.voice);
+      renderStats(b.stats);
+      if (roomsTab) roomsTab.apply(b.rooms);
+      if (!withLists) return;
+      idle(()=>{
+        renderAudit(b.audit);
+        // Inputs may have changed while the bundle was in flight.
+        const now = searchRequest();
+        if (sr && now && now.qs === sr.qs && b.search && b.search.users){
+          cancelSearch();
+          renderSearchResults(b.search.users);
+          finishSearch(sr.params, sr.key, b.search.users);
+        } else {
+          runSearch();
+        }
+      });
+    }
 
-    refreshVoiceSettings();
-    refreshStats();
-    setInterval(refreshStats, 15000);
+    // Auto-refresh only while both the page and the panel are visible, and
+    // catch up once when the page is shown again.
+    const statsVisible = ()=>document.visibilityState === 'visible' && !panel.classList.contains('ecap-hidden');
+    const onStatsVisible = ()=>{ if (statsVisible()) refreshStats(); };
+    const statsTimer = setInterval(onStatsVisible, 15000);
+    document.addEventListener('visibilitychange', onStatsVisible);
+    onPanelTeardown(()=>{
+      clearInterval(statsTimer);
+      document.removeEventListener('visibilitychange', onStatsVisible);
+    });
 
     // keep Users tab in sync if dashboard input changes
     const dashTargetInput = secDash.querySelector('#ecapTargetInput');
-    dashTargetInput.addEventListener('input', ()=>{
+    dashTargetInput.addEventListener('input', debounce(()=>{
       const u = (dashTargetInput.value||'').trim();
       if (u) setTargetUser(u, {syncInput:false, loadDetail:false});
-    });
+    }, 150));
 
-    // Initial population
-    runSearch();
+    // Initial population: stats/voice, audit and the restored search start
+    // together; one failing does not keep the others from rendering.
+    Promise.allSettled([refreshBulk(), refreshAudit(), restoreSearch(true)]).then(rs=>{
+      for (const r of rs) if (r.status === 'rejected') log(`ERROR initial load: ${r.reason}`);
+    });
 
     log('admin panel injected (v3)');
     toast('ok','Admin panel ready', 'v3 UI loaded');
@@ -1925,18 +2447,193 @@ def build_admin_injection_snippet() -> str:
   function boot(){
     try{ buildPanel(); }catch(e){ console.error(e); }
   }
-  if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', boot);
+  if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', boot, {once:true});
   else boot();
 })();
 
 """
 
-    snippet = (
-        "\n<!-- EchoChat Admin Panel (server-injected; admin-only) -->\n"
-        f"<style id=\"ecAdminCss\">{css}</style>\n"
-        f"<script id=\"ecAdminJs\">{js}</script>\n"
-    )
-    return snippet
+
+def _minify_css(css: str) -> str:
+    """Conservative CSS minifier: comments, whitespace and redundant ';'."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    css = re.sub(r"(?<=[{;])\s*([-\w]+)\s*:\s*", r"\1:", css)
+    return css.replace(";}", "}").strip()
+
+
+def _minify_js(js: str) -> str:
+    """Conservative JS minifier: indentation, blank lines and full-line // comments.
+
+    Line breaks are kept so automatic semicolon insertion is unaffected, and
+    nothing inside a line is touched (strings/regexes stay intact).
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+# URL prefix for the extracted assets (see routes_auth.admin_panel_asset).
+ADMIN_PANEL_ASSET_PREFIX = "/admin/panel/"
+
+
+# Inline loader. Once the full bundle has loaded it owns the hotkeys itself
+# (window.ECAP is set), so this listener steps aside.
+ADMIN_PANEL_STUB_JS = r"""
+(function(){
+  if (!window.IS_ADMIN) return;
+
+  const BASE = {{ asset_prefix|tojson }};
+  const CSS_NAME = {{ css_name|tojson }};
+  const JS_NAME = {{ js_name|tojson }};
+  let loading = null;
+
+  function load(){
+    if (loading) return loading;
+    loading = new Promise((resolve, reject)=>{
+      const css = document.createElement('link');
+      css.rel = 'stylesheet';
+      css.id = 'ecAdminCss';
+      css.href = BASE + CSS_NAME;
+      const js = document.createElement('script');
+      js.id = 'ecAdminJs';
+      js.src = BASE + JS_NAME;
+      js.onload = resolve;
+      js.onerror = ()=>{ loading = null; css.remove(); js.remove(); reject(); };
+      document.head.appendChild(css);
+      document.head.appendChild(js);
+    });
+    return loading;
+  }
+
+  // Same key as STATE_KEY in ADMIN_PANEL_JS.
+  function leftOpen(){
+    try{ return !(JSON.parse(localStorage.getItem('ecap_state_v3')||'{}') || {}).closed; }catch(_){ return true; }
+  }
+
+  document.addEventListener('keydown', (e)=>{
+    if (window.ECAP && window.ECAP.toggle) return;
+    const k = (e && e.key ? String(e.key) : '').toLowerCase();
+    if (!(e.ctrlKey && e.altKey && k === 'p')) return;
+    e.preventDefault();
+    const reset = e.shiftKey;
+    load().then(()=>{
+      const api = window.ECAP || {};
+      if (reset && api.reset) api.reset();
+      else if (api.show) api.show();
+    }).catch(()=>{});
+  }, {capture:true, passive:false});
+
+  // A panel left open is restored off the first-paint path: after the page's
+  // own load event, when the main thread is idle.
+  function restore(){
+    const go = ()=>load().catch(()=>{});
+    if (window.requestIdleCallback) requestIdleCallback(go, {timeout: 2000});
+    else setTimeout(go, 0);
+  }
+  if (leftOpen()){
+    if (document.readyState === 'complete') restore();
+    else window.addEventListener('load', restore, {once:true});
+  }
+})();
+"""
+
+
+def _asset(content_type: str, text: str) -> dict:
+    body = text.encode("utf-8")
+    encoded = {"gzip": gzip.compress(body, 9)}
+    if brotli is not None:
+        encoded["br"] = brotli.compress(body, quality=11)
+    etag = hashlib.sha1(body).hexdigest()[:16]
+    return {"content_type": content_type, "identity": body, "encoded": encoded, "etag": etag}
+
+
+# Minified + pre-compressed once at import; served from memory.
+_ADMIN_PANEL_ASSETS = {
+    "admin_panel.css": _asset("text/css; charset=utf-8", _minify_css(ADMIN_PANEL_CSS)),
+    "admin_panel.js": _asset("application/javascript; charset=utf-8", _minify_js(ADMIN_PANEL_JS)),
+}
+
+# Content-hashed file names (admin_panel.<etag>.css) the loader stub requests.
+# A new build changes the URL, so these can be cached as immutable.
+ADMIN_PANEL_ASSET_NAMES = {
+    name: "{0}.{2}.{1}".format(*name.rpartition(".")[::2], asset["etag"])
+    for name, asset in _ADMIN_PANEL_ASSETS.items()
+}
+_VERSIONED_ASSETS = {hashed: name for name, hashed in ADMIN_PANEL_ASSET_NAMES.items()}
+
+
+def is_versioned_admin_panel_asset(name: str) -> bool:
+    """True if *name* is a content-hashed asset name (safe to cache forever)."""
+    return name in _VERSIONED_ASSETS
+
+
+def _coding_qvalues(accept_encoding: str | None) -> dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    out: dict[str, float] = {}
+    for part in (accept_encoding or "").split(","):
+        coding, _, params = part.partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.partition("=")
+            if k.strip().lower() == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        out[coding] = q
+    return out
+
+
+def get_admin_panel_asset(name: str, accept_encoding: str | None) -> tuple[bytes, str, str | None, str] | None:
+    """Return (body, content_type, content_encoding, etag) for an admin panel asset.
+
+    Accepts both the plain and the content-hashed names. Picks brotli, then
+    gzip, then identity based on the Accept-Encoding header; a coding is used
+    when it (or "*") is listed with q > 0. The ETag is suffixed with the
+    coding so each representation has its own strong validator. Returns None
+    for unknown asset names.
+    """
+    asset = _ADMIN_PANEL_ASSETS.get(_VERSIONED_ASSETS.get(name, name))
+    if asset is None:
+        return None
+    qvalues = _coding_qvalues(accept_encoding)
+    for coding in ("br", "gzip"):
+        if coding in asset["encoded"] and qvalues.get(coding, qvalues.get("*", 0.0)) > 0:
+            return asset["encoded"][coding], asset["content_type"], coding, f"{asset['etag']}-{coding}"
+    return asset["identity"], asset["content_type"], None, asset["etag"]
+
+
+# Compiled once per process; rendering never re-parses the template source.
+_JINJA_ENV = Environment(autoescape=False, auto_reload=False)
+_SNIPPET_TMPL = _JINJA_ENV.from_string(
+    "\n<!-- EchoChat Admin Panel (server-injected; admin-only) -->\n"
+    "<script id=\"ecAdminStub\">" + _minify_js(ADMIN_PANEL_STUB_JS) + "</script>\n"
+)
+_SNIPPET_DEFAULTS = {
+    "asset_prefix": ADMIN_PANEL_ASSET_PREFIX,
+    "css_name": ADMIN_PANEL_ASSET_NAMES["admin_panel.css"],
+    "js_name": ADMIN_PANEL_ASSET_NAMES["admin_panel.js"],
+}
+
+# With the default context the snippet never changes, so it is rendered once
+# at import instead of on every admin /chat render.
+_ADMIN_SNIPPET = _SNIPPET_TMPL.render(**_SNIPPET_DEFAULTS)
+
+
+def build_admin_injection_snippet(**ctx) -> str:
+    """Return the HTML snippet that loads the admin panel CSS + JS.
+
+    Keyword arguments override template variables (asset_prefix, css_name,
+    js_name); without any, the pre-rendered snippet is returned.
+    """
+    if not ctx:
+        return _ADMIN_SNIPPET
+    return _SNIPPET_TMPL.render(**{**_SNIPPET_DEFAULTS, **ctx})
+
 
 def inject_admin_panel(html: str) -> str:
     """Inject the admin panel snippet into the provided HTML document."""
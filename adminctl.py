@@ -23,6 +23,7 @@ Usage:
 Options:
   --role admin        Role name to grant/revoke (default: admin)
   --create-role       If the role does not exist, create it automatically (safe for dev)
+  --ensure-indexes    Create missing lookup indexes first (LOWER(users.email), admins, audit_log)
 """
 
 from __future__ import annotations
@@ -38,6 +39,125 @@ import psycopg2
 from constants import CONFIG_FILE, get_db_connection_string, sanitize_postgres_dsn
 
 
+# ── SQL ───────────────────────────────────────────────────────────
+# Statements are module constants so call sites only bind parameters.
+# Identifier lookup (shared by every command): numeric id first, then exact
+# username, then email (case-insensitive). Parameters: %(id)s (int or None),
+# %(ident)s. Each branch is its own index lookup (users pkey, the username
+# UNIQUE index, and the partial LOWER(email) index, whose predicate the
+# email branch repeats so the planner can use it); the priority column
+# picks the best match.
+_USER_LOOKUP = """(
+    SELECT id, username, email, is_admin FROM (
+        SELECT 0 AS prio, id, username, email, is_admin FROM users WHERE id = %(id)s
+        UNION ALL
+        SELECT 1, id, username, email, is_admin FROM users WHERE username = %(ident)s
+        UNION ALL
+        SELECT 2, id, username, email, is_admin FROM users
+        WHERE LOWER(email) = LOWER(%(ident)s) AND email IS NOT NULL AND BTRIM(email) <> ''
+    ) m
+    ORDER BY prio
+    LIMIT 1
+)"""
+
+SQL_FIND_USER = f"SELECT id, username, email, is_admin FROM {_USER_LOOKUP} u;"
+
+# Lookup, optional role creation, is_admin flag and role assignment in one
+# round trip. Writes only happen when both the user and the role resolve; the
+# final SELECT reports which of them did.
+SQL_GRANT = f"""
+    WITH u AS (SELECT id, username, email FROM {_USER_LOOKUP} hit),
+    r AS (SELECT id FROM roles WHERE name = %(role)s),
+    rc AS (
+        INSERT INTO roles (name, description)
+        SELECT %(role)s, %(role_desc)s
+        WHERE %(create_role)s AND EXISTS (SELECT 1 FROM u) AND NOT EXISTS (SELECT 1 FROM r)
+        RETURNING id
+    ),
+    rr AS (SELECT id FROM r UNION ALL SELECT id FROM rc),
+    upd AS (
+        UPDATE users SET is_admin = TRUE
+        WHERE id = (SELECT id FROM u) AND EXISTS (SELECT 1 FROM rr)
+        RETURNING id
+    ),
+    ins AS (
+        INSERT INTO user_roles (user_id, role_id)
+        SELECT u.id, rr.id FROM u, rr
+        ON CONFLICT (user_id, role_id) DO NOTHING
+        RETURNING user_id
+    )
+    SELECT u.id, u.username, u.email, (SELECT id FROM rr LIMIT 1) FROM u;
+"""
+
+# Data-modifying CTEs all see the pre-statement snapshot, so "no admin role
+# left" cannot be re-checked after the DELETE. Role names are unique, so
+# revoking 'admin' always removes the last admin assignment; is_admin is
+# cleared in that case only.
+SQL_REVOKE = f"""
+    WITH u AS (SELECT id, username, email FROM {_USER_LOOKUP} hit),
+    r AS (SELECT id FROM roles WHERE name = %(role)s),
+    del AS (
+        DELETE FROM user_roles
+        WHERE user_id = (SELECT id FROM u) AND role_id = (SELECT id FROM r)
+        RETURNING user_id
+    ),
+    upd AS (
+        UPDATE users SET is_admin = FALSE
+        WHERE id = (SELECT id FROM u) AND %(role)s = 'admin' AND EXISTS (SELECT 1 FROM r)
+        RETURNING id
+    )
+    SELECT u.id, u.username, u.email, (SELECT id FROM r) FROM u;
+"""
+
+SQL_USER_ROLES = """
+    SELECT r.name
+    FROM user_roles ur
+    JOIN roles r ON r.id = ur.role_id
+    WHERE ur.user_id = %s
+    ORDER BY r.name;
+"""
+
+SQL_LIST_ADMINS = """
+    SELECT u.id, u.username, u.email, u.is_admin
+    FROM users u
+    WHERE u.is_admin = TRUE
+    ORDER BY u.username;
+"""
+
+# Opt-in (--ensure-indexes). users.username is already UNIQUE. The schema's
+# users_email_unique_ci index is skipped by init_database when duplicate
+# emails exist; only then is a plain LOWER(email) index built to back the
+# email branch above. The partial is_admin index keeps `list` to a scan of
+# the admins only; audit_log(timestamp) backs the admin panel's "recent
+# events" view. Builds are CONCURRENTLY so a live server keeps writing to
+# users/audit_log meanwhile.
+# Entries: (index name, index whose presence makes it redundant, CREATE).
+SQL_ENSURE_INDEXES = (
+    (
+        "idx_users_email_lower",
+        "users_email_unique_ci",
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_email_lower ON users (LOWER(email));",
+    ),
+    (
+        "idx_users_admins",
+        None,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_users_admins ON users (username) WHERE is_admin = TRUE;",
+    ),
+    (
+        "idx_audit_log_timestamp",
+        None,
+        "CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_log_timestamp ON audit_log (timestamp DESC);",
+    ),
+)
+
+# NULL when the index does not exist, otherwise whether it is usable (a
+# failed CONCURRENTLY build leaves it behind as INVALID).
+SQL_INDEX_VALID = "SELECT (SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s));"
+
+
+def _ident_params(ident: str) -> dict:
+    return {"id": int(ident) if ident.isdigit() else None, "ident": ident}
+
 
 def _dsn_from_server_config() -> str | None:
     """Best-effort DSN discovery from server_config.json.
@@ -61,99 +181,60 @@ def _dsn_from_server_config() -> str | None:
 
 
 def _find_user(cur, ident: str):
-    # Prefer exact username match; fall back to email; then id if numeric.
     ident = ident.strip()
     if not ident:
         return None
-    # numeric id?
-    if ident.isdigit():
-        cur.execute("SELECT id, username, email, is_admin FROM users WHERE id = %s;", (int(ident),))
-        return cur.fetchone()
-
-    cur.execute("SELECT id, username, email, is_admin FROM users WHERE username = %s;", (ident,))
-    row = cur.fetchone()
-    if row:
-        return row
-
-    cur.execute("SELECT id, username, email, is_admin FROM users WHERE email = %s;", (ident,))
+    cur.execute(SQL_FIND_USER, _ident_params(ident))
     return cur.fetchone()
 
 
-def _get_role_id(cur, role: str, create_role: bool):
-    cur.execute("SELECT id FROM roles WHERE name = %s;", (role,))
-    r = cur.fetchone()
-    if r:
-        return r[0]
-
-    if not create_role:
-        return None
-
-    # Minimal role creation. Permissions should already exist for a seeded schema,
-    # but in case this runs before seeding, we still create a placeholder role.
-    cur.execute("INSERT INTO roles (name, description) VALUES (%s, %s) RETURNING id;", (role, f"{role} role"))
-    return cur.fetchone()[0]
-
-
 def cmd_grant(conn, ident: str, role: str, create_role: bool) -> int:
+    ident = ident.strip()
+    if not ident:
+        print(f"❌ User not found: {ident}")
+        return 1
     with conn.cursor() as cur:
-        user = _find_user(cur, ident)
-        if not user:
-            print(f"❌ User not found: {ident}")
-            return 1
-        user_id, username, email, is_admin = user
-
-        role_id = _get_role_id(cur, role, create_role)
-        if role_id is None:
-            print(f"❌ Role not found: {role} (run init_database / seeding, or pass --create-role)")
-            return 1
-
-        cur.execute("UPDATE users SET is_admin = TRUE WHERE id = %s;", (user_id,))
         cur.execute(
-            """
-            INSERT INTO user_roles (user_id, role_id)
-            VALUES (%s, %s)
-            ON CONFLICT (user_id, role_id) DO NOTHING;
-            """,
-            (user_id, role_id),
+            SQL_GRANT,
+            {
+                **_ident_params(ident),
+                "role": role,
+                "role_desc": f"{role} role",
+                "create_role": create_role,
+            },
         )
+        row = cur.fetchone()
+    if not row:
+        conn.rollback()
+        print(f"❌ User not found: {ident}")
+        return 1
+    user_id, username, email, role_id = row
+    if role_id is None:
+        conn.rollback()
+        print(f"❌ Role not found: {role} (run init_database / seeding, or pass --create-role)")
+        return 1
     conn.commit()
     print(f"✅ Granted '{role}' to {username}{' <'+email+'>' if email else ''}")
     return 0
 
 
 def cmd_revoke(conn, ident: str, role: str) -> int:
+    ident = ident.strip()
+    if not ident:
+        print(f"❌ User not found: {ident}")
+        return 1
     with conn.cursor() as cur:
-        user = _find_user(cur, ident)
-        if not user:
-            print(f"❌ User not found: {ident}")
-            return 1
-        user_id, username, email, is_admin = user
-
-        cur.execute("SELECT id FROM roles WHERE name = %s;", (role,))
-        r = cur.fetchone()
-        if not r:
-            print(f"❌ Role not found: {role}")
-            return 1
-        role_id = r[0]
-
-        cur.execute("DELETE FROM user_roles WHERE user_id = %s AND role_id = %s;", (user_id, role_id))
-
-        # Only flip is_admin off if the user has no remaining admin role assignment(s).
-        # If you use multiple admin-like roles, adjust this logic.
-        if role == "admin":
-            cur.execute(
-                """
-                SELECT 1
-                FROM user_roles ur
-                JOIN roles r ON r.id = ur.role_id
-                WHERE ur.user_id = %s AND r.name = 'admin'
-                LIMIT 1;
-                """,
-                (user_id,),
-            )
-            still_admin = cur.fetchone() is not None
-            if not still_admin:
-                cur.execute("UPDATE users SET is_admin = FALSE WHERE id = %s;", (user_id,))
+        cur.execute(SQL_REVOKE, {**_ident_params(ident), "role": role})
+        row = cur.fetchone()
+    if not row:
+        conn.rollback()
+        print(f"❌ User not found: {ident}")
+        return 1
+    user_id, username, email, role_id = row
+    if role_id is None:
+        conn.rollback()
+        print(f"❌ Role not found: {role}")
+        return 1
     conn.commit()
     print(f"✅ Revoked '{role}' from {username}{' <'+email+'>' if email else ''}")
     return 0
@@ -167,16 +248,7 @@ def cmd_status(conn, ident: str) -> int:
             return 1
         user_id, username, email, is_admin = user
 
-        cur.execute(
-            """
-            SELECT r.name
-            FROM user_roles ur
-            JOIN roles r ON r.id = ur.role_id
-            WHERE ur.user_id = %s
-            ORDER BY r.name;
-            """,
-            (user_id,),
-        )
+        cur.execute(SQL_USER_ROLES, (user_id,))
         roles = [r[0] for r in cur.fetchall()]
 
     print(f"User: {username}{' <'+email+'>' if email else ''} (id={user_id})")
@@ -187,14 +259,7 @@ def cmd_status(conn, ident: str) -> int:
 
 def cmd_list(conn) -> int:
     with conn.cursor() as cur:
-        cur.execute(
-            """
-            SELECT u.id, u.username, u.email, u.is_admin
-            FROM users u
-            WHERE u.is_admin = TRUE
-            ORDER BY u.username;
-            """
-        )
+        cur.execute(SQL_LIST_ADMINS)
         rows = cur.fetchall()
 
     if not rows:
@@ -206,6 +271,30 @@ def cmd_list(conn) -> int:
     return 0
 
 
+def _index_valid(cur, name: str) -> bool | None:
+    cur.execute(SQL_INDEX_VALID, (name,))
+    return cur.fetchone()[0]
+
+
+def ensure_indexes(conn) -> None:
+    # CREATE/DROP INDEX CONCURRENTLY cannot run inside a transaction block.
+    conn.commit()
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            for name, covered_by, stmt in SQL_ENSURE_INDEXES:
+                if covered_by and _index_valid(cur, covered_by):
+                    continue
+                if _index_valid(cur, name) is False:
+                    # Left INVALID by an interrupted concurrent build; IF NOT
+                    # EXISTS would keep skipping it, so rebuild from scratch.
+                    cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name};")
+                cur.execute(stmt)
+    finally:
+        conn.autocommit = autocommit
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Grant/revoke admin rights for a specific user.")
     parser.add_argument(
@@ -213,6 +302,11 @@ def main() -> int:
         default=None,
         help="Override Postgres DSN (otherwise uses server_config.json, env, or constants.py fallback)",
     )
+    parser.add_argument(
+        "--ensure-indexes",
+        action="store_true",
+        help="Create the lookup indexes adminctl relies on (idempotent; off by default)",
+    )
     sub = parser.add_subparsers(dest="cmd", required=True)
 
     p_grant = sub.add_parser("grant", aliases=["gr"], help="Grant admin role to a user")
@@ -247,6 +341,13 @@ def main() -> int:
         print(f"Details: {e}")
         return 3
     try:
+        if args.ensure_indexes:
+            ensure_indexes(conn)
+        if args.cmd in {"status", "list"}:
+            # Read-only commands: autocommit skips the BEGIN/COMMIT round
+            # trips. (readonly=True would cost a SET default_transaction_
+            # read_only round trip of its own in autocommit mode.)
+            conn.autocommit = True
         if args.cmd == "grant":
             return cmd_grant(conn, args.identifier, args.role.strip().lower(), bool(args.create_role))
         if args.cmd == "revoke":
@@ -1,16 +1,37 @@
 #!/usr/bin/env python3
 import os
-import json
 import base64
 import logging
+import mmap
+import stat
+import tempfile
 
 from cryptography.fernet import Fernet
 
-from constants import CONFIG_FILE
+from constants import CONFIG_FILE, is_json_object, json_loads_bytes
 from encryption import encrypt_config, decrypt_config
 from interactive_setup import get_default_settings
 
 
+# Below this size a plain read() is cheaper than setting up a mapping.
+_MMAP_MIN_SIZE = 4096
+
+
+def _parse_config(buf, key):
+    # EchoChat's current main path uses *plaintext JSON* for server_config.json.
+    # Older/experimental flows used Fernet-encrypted bytes.
+    # Detect JSON first; fall back to Fernet decryption.
+    # Fernet tokens are base64 and never start with "{", so the first
+    # non-blank byte is enough; the parser rejects anything malformed.
+    try:
+        if is_json_object(buf):
+            return json_loads_bytes(buf)
+    except Exception:
+        pass
+
+    return decrypt_config(bytes(buf), key)
+
+
 def load_config(key):
     """
     Load and decrypt the configuration from CONFIG_FILE, returning a dict.
@@ -21,19 +42,12 @@ def load_config(key):
             return get_default_settings()
 
         with open(CONFIG_FILE, "rb") as f:
-            data = f.read()
-
-        # EchoChat's current main path uses *plaintext JSON* for server_config.json.
-        # Older/experimental flows used Fernet-encrypted bytes.
-        # Detect JSON first; fall back to Fernet decryption.
-        try:
-            text = data.decode("utf-8").strip()
-            if text.startswith("{") and text.endswith("}"):
-                return json.loads(text)
-        except Exception:
-            pass
-
-        return decrypt_config(data, key)
+            if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+                return _parse_config(f.read(), key)
+            # Large file: parse straight out of the page cache.
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    return _parse_config(view, key)
     except Exception as e:
         logging.error("Failed to load configuration: %s", str(e))
         return get_default_settings()
@@ -43,11 +57,35 @@ def save_config(settings, key):
     """
     Encrypt and save the settings dictionary to CONFIG_FILE.
     """
+    tmp = None
     try:
         encrypted_data = encrypt_config(settings, key)
-        with open(CONFIG_FILE, "wb") as f:
+        # Write a unique sibling file and rename it over CONFIG_FILE so
+        # readers never see a half-written config, even if we crash mid-save
+        # or two saves race. mkstemp creates it 0600; an existing config
+        # keeps its own permissions.
+        fd, tmp = tempfile.mkstemp(
+            prefix=os.path.basename(CONFIG_FILE) + ".",
+            suffix=".tmp",
+            dir=os.path.dirname(CONFIG_FILE) or ".",
+        )
+        with os.fdopen(fd, "wb") as f:
+            try:
+                os.chmod(tmp, stat.S_IMODE(os.stat(CONFIG_FILE).st_mode))
+            except FileNotFoundError:
+                pass
             f.write(encrypted_data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, CONFIG_FILE)
+        tmp = None
         logging.info("Configuration saved successfully.")
     except Exception as e:
         logging.error("Failed to save configuration: %s", str(e))
         raise
+    finally:
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 import os
 import base64
+from functools import lru_cache
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives import hashes
@@ -11,6 +12,15 @@ from security import get_admin_password
 import getpass
 
 
+@lru_cache(maxsize=8)
+def _fernet(key):
+    """
+    Return a Fernet instance for key, built once per key.
+    Fernet holds no per-message state, so instances are safe to share.
+    """
+    return Fernet(key)
+
+
 def encrypt_config(settings, key):
     """
     Encrypt the JSON-serialized settings using Fernet.
@@ -18,7 +28,7 @@ def encrypt_config(settings, key):
     """
     import json
     json_data = json.dumps(settings).encode()
-    f = Fernet(key)
+    f = _fernet(key)
     return f.encrypt(json_data)
 
 
@@ -28,7 +38,7 @@ def decrypt_config(encrypted_data, key):
     Returns the settings as a Python dictionary.
     """
     import json
-    f = Fernet(key)
+    f = _fernet(key)
     decrypted = f.decrypt(encrypted_data)
     return json.loads(decrypted.decode())
 
@@ -15,7 +15,7 @@ import os
 import random
 from pathlib import Path
 
-from flask import jsonify, request, session, current_app
+from flask import Response, jsonify, request, session, current_app, stream_with_context
 from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
 
 from database import get_db, get_db_identity, get_schema_version
@@ -120,6 +120,46 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
             row = cur.fetchone()
         return row[0] if row else None
 
+    # ── Moderation writes ─────────────────────────────────────────
+    # Shared by the single-action endpoints and /admin/moderate so the two
+    # paths run the same SQL. They only execute on `cur`; callers commit.
+    def _add_sanction(cur, username: str, sanction_type: str, reason: str, expires_at=None) -> None:
+        cur.execute(
+            """
+            INSERT INTO user_sanctions (username, sanction_type, reason, expires_at)
+            VALUES (%s, %s, %s, %s);
+            """,
+            (username, sanction_type, reason, expires_at),
+        )
+
+    def _set_quota(cur, username: str, messages_per_hour: int) -> None:
+        cur.execute(
+            """
+            INSERT INTO user_quotas (username, messages_per_hour)
+            VALUES (%s, %s)
+            ON CONFLICT (username) DO UPDATE SET messages_per_hour = EXCLUDED.messages_per_hour, updated_at = NOW();
+            """,
+            (username, messages_per_hour),
+        )
+
+    def _set_custom_status(cur, username: str, status: str) -> None:
+        cur.execute("UPDATE users SET custom_status = %s WHERE username = %s;", (status, username))
+
+    def _get_role_id(cur, role_name: str) -> int | None:
+        cur.execute("SELECT id FROM roles WHERE name = %s;", (role_name,))
+        row = cur.fetchone()
+        return row[0] if row else None
+
+    def _add_user_role(cur, user_id: int, role_id: int) -> None:
+        cur.execute(
+            """
+            INSERT INTO user_roles (user_id, role_id)
+            VALUES (%s, %s)
+            ON CONFLICT (user_id, role_id) DO NOTHING;
+            """,
+            (user_id, role_id),
+        )
+
     def _connected_usernames() -> list[str]:
         """Best-effort list of currently connected usernames."""
         if CONNECTED_USERS_LOCK is None:
@@ -287,6 +327,9 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
     @require_permission("admin:basic")
     def admin_stats():
         """Lightweight operational stats for the injected admin panel."""
+        return jsonify(_stats_payload())
+
+    def _stats_payload() -> dict:
         conn = get_db()
         with conn.cursor() as cur:
             cur.execute("SELECT COUNT(*) FROM users;")
@@ -327,30 +370,28 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
 
         uptime_seconds = max(0, int((_utcnow() - STARTED_AT).total_seconds()))
 
-        return jsonify(
-            {
-                # Back-compat keys
-                "registered_users": registered,
-                "online_users": online_live,
-                "online_usernames": live,
-                "rooms": rooms,
-                "server_time": _utcnow().isoformat(),
-
-                # Extra ops detail
-                "uptime_seconds": uptime_seconds,
-                "postgres_version": pg_version,
-                "connected_sessions": int(len(live) or 0),
-                "voice_rooms": voice_rooms,
-                "voice_total_users": voice_total_users,
-                "voice_by_room": voice_by_room,
-                "settings_snapshot": {
-                    "voice_enabled": bool(settings.get("voice_enabled", True)),
-                    "voice_max_room_peers": int(settings.get("voice_max_room_peers", 0) or 0),
-                    "p2p_file_enabled": bool(settings.get("p2p_file_enabled", True)),
-                    "giphy_enabled": bool(settings.get("giphy_enabled", True)),
-                },
-            }
-        )
+        return {
+            # Back-compat keys
+            "registered_users": registered,
+            "online_users": online_live,
+            "online_usernames": live,
+            "rooms": rooms,
+            "server_time": _utcnow().isoformat(),
+
+            # Extra ops detail
+            "uptime_seconds": uptime_seconds,
+            "postgres_version": pg_version,
+            "connected_sessions": int(len(live) or 0),
+            "voice_rooms": voice_rooms,
+            "voice_total_users": voice_total_users,
+            "voice_by_room": voice_by_room,
+            "settings_snapshot": {
+                "voice_enabled": bool(settings.get("voice_enabled", True)),
+                "voice_max_room_peers": int(settings.get("voice_max_room_peers", 0) or 0),
+                "p2p_file_enabled": bool(settings.get("p2p_file_enabled", True)),
+                "giphy_enabled": bool(settings.get("giphy_enabled", True)),
+            },
+        }
 
     # ── Runtime settings (admin GUI) ──────────────────────────────
     def _settings_path() -> Path:
@@ -457,13 +498,14 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
     @require_permission("admin:basic")
     def admin_get_voice_settings():
         """Return current voice settings for the injected admin panel."""
-        return jsonify(
-            {
-                "ok": True,
-                "voice_enabled": bool(settings.get("voice_enabled", True)),
-                "voice_max_room_peers": int(settings.get("voice_max_room_peers", 0) or 0),
-            }
-        )
+        return jsonify(_voice_payload())
+
+    def _voice_payload() -> dict:
+        return {
+            "ok": True,
+            "voice_enabled": bool(settings.get("voice_enabled", True)),
+            "voice_max_room_peers": int(settings.get("voice_max_room_peers", 0) or 0),
+        }
 
     @app.route("/admin/settings/voice", methods=["POST"])
     @require_permission("admin:basic")
@@ -673,28 +715,20 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
         return jsonify({"users": users})
 
     # ── Enhanced user search + detail (admin GUI) ─────────────────
-    @app.route("/admin/user_search")
-    @require_permission("admin:basic")
-    def admin_user_search():
-        """Search users by username/email/id with lightweight filters.
+    def _user_search_query(args) -> tuple[str, list, str, str, int]:
+        """Build the user search SELECT from request args.
 
-        Query params:
-          - q: search string (optional)
-          - mode: contains|prefix|exact|email|id (default contains)
-          - online: 1/0 (online only)
-          - admins: 1/0 (admins only)
-          - status: any|active|deactivated (default any)
-          - limit: max rows (default 50, max 200)
+        Returns (sql, params, q, mode, limit); shared by the JSON and the
+        streaming search endpoints.
         """
-
-        q = (request.args.get("q") or "").strip()
-        mode = (request.args.get("mode") or "contains").strip().lower()
-        online_only = (request.args.get("online") or "0").strip().lower() in {"1", "true", "yes", "on"}
-        admins_only = (request.args.get("admins") or "0").strip().lower() in {"1", "true", "yes", "on"}
-        status = (request.args.get("status") or "any").strip().lower()
+        q = (args.get("q") or "").strip()
+        mode = (args.get("mode") or "contains").strip().lower()
+        online_only = (args.get("online") or "0").strip().lower() in {"1", "true", "yes", "on"}
+        admins_only = (args.get("admins") or "0").strip().lower() in {"1", "true", "yes", "on"}
+        status = (args.get("status") or "any").strip().lower()
 
         try:
-            limit = int(request.args.get("limit") or 50)
+            limit = int(args.get("limit") or 50)
         except Exception:
             limit = 50
         limit = max(1, min(limit, 200))
@@ -736,31 +770,81 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
             sql += " WHERE " + " AND ".join(where)
         sql += " ORDER BY online DESC, LOWER(username) ASC LIMIT %s;"
         params.append(limit)
+        return sql, params, q, mode, limit
+
+    def _user_search_row(r) -> dict:
+        return {
+            "id": int(r[0]),
+            "username": r[1],
+            "email": r[2],
+            "is_admin": bool(r[3]),
+            "status": r[4],
+            "online": bool(r[5]),
+            "last_seen": r[6].isoformat() if r[6] else None,
+            "created_at": r[7].isoformat() if r[7] else None,
+            "presence_status": r[8],
+            "custom_status": r[9],
+            "two_factor_enabled": bool(r[10]),
+        }
+
+    @app.route("/admin/user_search")
+    @require_permission("admin:basic")
+    def admin_user_search():
+        """Search users by username/email/id with lightweight filters.
+
+        Query params:
+          - q: search string (optional)
+          - mode: contains|prefix|exact|email|id (default contains)
+          - online: 1/0 (online only)
+          - admins: 1/0 (admins only)
+          - status: any|active|deactivated (default any)
+          - limit: max rows (default 50, max 200)
+        """
+        return jsonify(_user_search_payload(request.args))
+
+    def _user_search_payload(args) -> dict:
+        sql, params, q, mode, limit = _user_search_query(args)
 
         conn = get_db()
         with conn.cursor() as cur:
             cur.execute(sql, tuple(params))
             rows = cur.fetchall() or []
 
-        out = []
-        for r in rows:
-            out.append(
-                {
-                    "id": int(r[0]),
-                    "username": r[1],
-                    "email": r[2],
-                    "is_admin": bool(r[3]),
-                    "status": r[4],
-                    "online": bool(r[5]),
-                    "last_seen": r[6].isoformat() if r[6] else None,
-                    "created_at": r[7].isoformat() if r[7] else None,
-                    "presence_status": r[8],
-                    "custom_status": r[9],
-                    "two_factor_enabled": bool(r[10]),
-                }
-            )
+        out = [_user_search_row(r) for r in rows]
+        return {"users": out, "q": q, "mode": mode, "limit": limit}
 
-        return jsonify({"users": out, "q": q, "mode": mode, "limit": limit})
+    @app.route("/admin/user_search/stream")
+    @require_permission("admin:basic")
+    def admin_user_search_stream():
+        """Same query as /admin/user_search, sent as Server-Sent Events.
+
+        Each event is ``{"users": [...up to 10 rows], "done": bool}`` so the
+        panel can paint the first rows before the rest have left Postgres.
+        The final event always has done=true (possibly with no users).
+        """
+        sql, params, _q, _mode, _limit = _user_search_query(request.args)
+
+        def _events():
+            conn = get_db()
+            # Named (server-side) cursor: each fetchmany() is a FETCH of the
+            # next 10 rows, instead of the whole result arriving on execute().
+            with conn.cursor(name="admin_user_search_stream") as cur:
+                cur.itersize = 10
+                cur.execute(sql, tuple(params))
+                chunk = cur.fetchmany(10)
+                if not chunk:
+                    yield f"data: {json.dumps({'users': [], 'done': True})}\n\n"
+                    return
+                while chunk:
+                    nxt = cur.fetchmany(10)
+                    payload = {"users": [_user_search_row(r) for r in chunk], "done": not nxt}
+                    yield f"data: {json.dumps(payload)}\n\n"
+                    chunk = nxt
+
+        resp = Response(stream_with_context(_events()), mimetype="text/event-stream")
+        resp.headers["Cache-Control"] = "no-cache"
+        resp.headers["X-Accel-Buffering"] = "no"
+        return resp
 
     @app.route("/admin/user_detail/<username>")
     @require_permission("admin:basic")
@@ -885,6 +969,9 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
     @app.route("/admin/rooms/list")
     @require_permission("admin:basic")
     def admin_rooms_list():
+        return jsonify(_rooms_payload())
+
+    def _rooms_payload() -> dict:
         # Live online counts are derived from Socket.IO session state.
         # Important: chat_rooms.member_count can drift if users have multiple tabs,
         # stale sockets, or disconnect events don’t fire in the expected order.
@@ -959,7 +1046,51 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
         except Exception:
             pass
 
-        return jsonify({"rooms": rooms, "ts": _utcnow().isoformat()})
+        return {"rooms": rooms, "ts": _utcnow().isoformat()}
+
+    # ── Batched panel snapshot ────────────────────────────────────
+    # Each op is the payload builder behind its own endpoint. All of those
+    # endpoints require admin:basic, same as /admin/bulk itself.
+    _bulk_ops = {
+        "stats": lambda _args: _stats_payload(),
+        "voice": lambda _args: _voice_payload(),
+        "rooms": lambda _args: _rooms_payload(),
+        "audit": lambda args: _audit_recent_payload(args),
+        "search": lambda args: _user_search_payload(args),
+    }
+
+    @app.route("/admin/bulk")
+    @require_permission("admin:basic")
+    def admin_bulk():
+        """Return several read-only panel snapshots in one request.
+
+        Query params:
+          - ops: comma-separated subset of stats|voice|rooms|audit|search
+          - <op>.<param>: parameters for one op, e.g. audit.q, search.mode
+            (same names as /admin/audit/recent and /admin/user_search)
+
+        Each op's payload is exactly what its own endpoint returns; an op that
+        fails yields {"ok": false, "error": ...} without failing the others.
+        """
+        ops = [o.strip().lower() for o in (request.args.get("ops") or "").split(",") if o.strip()]
+        out = {"ok": True}
+        for op in ops:
+            run = _bulk_ops.get(op)
+            if run is None:
+                out[op] = {"ok": False, "error": "unknown_op"}
+                continue
+            prefix = op + "."
+            args = {k[len(prefix):]: v for k, v in request.args.items() if k.startswith(prefix)}
+            try:
+                out[op] = run(args)
+            except Exception as e:
+                # Keep the shared connection usable for the remaining ops.
+                try:
+                    get_db().rollback()
+                except Exception:
+                    pass
+                out[op] = {"ok": False, "error": str(e)}
+        return jsonify(out)
 
     # ── Delete custom room (admin) ────────────────────────────────
     @app.route("/admin/rooms/delete/<path:room>", methods=["POST"])
@@ -1333,9 +1464,12 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
     @app.route("/admin/audit/recent")
     @require_permission("admin:basic")
     def admin_audit_recent():
-        q = (request.args.get("q") or "").strip()
+        return jsonify(_audit_recent_payload(request.args))
+
+    def _audit_recent_payload(args) -> dict:
+        q = (args.get("q") or "").strip()
         try:
-            limit = int(request.args.get("limit") or 50)
+            limit = int(args.get("limit") or 50)
         except Exception:
             limit = 50
         limit = max(1, min(limit, 200))
@@ -1379,7 +1513,7 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
                     "details": r[4],
                 }
             )
-        return jsonify({"ok": True, "events": out, "q": q, "limit": limit})
+        return {"ok": True, "events": out, "q": q, "limit": limit}
 
     @app.route("/admin/create_user", methods=["POST"])
     @require_permission("admin:super")
@@ -1578,13 +1712,7 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
         conn = get_db()
         try:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO user_sanctions (username, sanction_type, reason, expires_at)
-                    VALUES (%s, 'ban', %s, %s);
-                    """,
-                    (username, reason, expires_at),
-                )
+                _add_sanction(cur, username, "ban", reason, expires_at)
             conn.commit()
             log_audit_event(actor, "suspend_user", username, f"{minutes} min suspension")
             return jsonify({"status": "suspended", "user": username, "duration": minutes})
@@ -1761,19 +1889,11 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
 
         conn = get_db()
         with conn.cursor() as cur:
-            cur.execute("SELECT id FROM roles WHERE name = %s;", (role_name,))
-            role = cur.fetchone()
-            if not role:
+            role_id = _get_role_id(cur, role_name)
+            if not role_id:
                 return jsonify({"error": "Role does not exist"}), 404
 
-            cur.execute(
-                """
-                INSERT INTO user_roles (user_id, role_id)
-                VALUES (%s, %s)
-                ON CONFLICT (user_id, role_id) DO NOTHING;
-                """,
-                (user_id, role[0]),
-            )
+            _add_user_role(cur, user_id, role_id)
 
         conn.commit()
         log_audit_event(actor, "assign_role", username, f"Role: {role_name}")
@@ -1791,13 +1911,7 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
         conn = get_db()
         try:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO user_sanctions (username, sanction_type, reason, expires_at)
-                    VALUES (%s, 'mute', %s, %s);
-                    """,
-                    (username, reason, expires_at),
-                )
+                _add_sanction(cur, username, "mute", reason, expires_at)
             conn.commit()
             log_audit_event(actor, "mute_user", username, f"{minutes} min mute")
             return jsonify({"status": "muted", "user": username})
@@ -1890,13 +2004,7 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
         conn = get_db()
         try:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO user_sanctions (username, sanction_type, reason)
-                    VALUES (%s, 'shadowban', %s);
-                    """,
-                    (username, reason),
-                )
+                _add_sanction(cur, username, "shadowban", reason)
             conn.commit()
             log_audit_event(actor, "shadowban", username, reason)
             return jsonify({"status": "shadowbanned", "user": username})
@@ -1904,6 +2012,113 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
             conn.rollback()
             return jsonify({"error": str(e)}), 500
 
+    # ── Composite moderation (admin panel "Moderate…" form) ──────────
+    @app.route("/admin/moderate/<username>", methods=["POST"])
+    @require_permission("admin:basic")
+    def moderate_user(username):
+        """Apply several moderation changes to one user in a single request.
+
+        Only the form fields that are present are applied:
+          suspend_minutes, mute_minutes, messages_per_hour, status,
+          clear_status=1, role (admin:super), shadowban=1 (admin:super),
+          reason.
+
+        An empty status means "no change"; clear_status=1 clears it.
+
+        All writes share one transaction; the individual endpoints above stay
+        available for scripts and older clients.
+        """
+        actor = _actor()
+        form = request.form
+        reason = (form.get("reason") or "").strip()
+
+        def _int_field(name: str, minimum: int) -> int | None:
+            raw = (form.get(name) or "").strip()
+            if not raw:
+                return None
+            value = int(raw)
+            if value < minimum:
+                raise ValueError(name)
+            return value
+
+        try:
+            # A zero-minute sanction would be born expired.
+            suspend_minutes = _int_field("suspend_minutes", 1)
+            mute_minutes = _int_field("mute_minutes", 1)
+            quota = _int_field("messages_per_hour", 0)
+        except ValueError:
+            return jsonify({"error": "Durations must be positive integers; the quota a non-negative integer"}), 400
+
+        status = (form.get("status") or "").strip() or None
+        clear_status = (form.get("clear_status") or "").strip().lower() in {"1", "true", "yes", "on"}
+        if status is not None and clear_status:
+            return jsonify({"error": "Give a status or clear it, not both"}), 400
+        if clear_status:
+            status = ""
+        if status is not None and len(status) > 128:
+            return jsonify({"error": "Status too long"}), 400
+        role_name = (form.get("role") or "").strip().lower()
+        shadowban = (form.get("shadowban") or "").strip().lower() in {"1", "true", "yes", "on"}
+
+        if suspend_minutes is None and mute_minutes is None and quota is None and status is None and not role_name and not shadowban:
+            return jsonify({"error": "Nothing to apply"}), 400
+
+        if (role_name or shadowban) and not session.get("is_super_admin"):
+            if "admin:super" not in set(get_user_permissions(actor)):
+                return jsonify({"error": "Forbidden: admin:super required"}), 403
+
+        applied: list[str] = []
+        audit: list[tuple[str, str]] = []
+        conn = get_db()
+        try:
+            with conn.cursor() as cur:
+                if suspend_minutes is not None:
+                    _add_sanction(
+                        cur, username, "ban", reason or "Suspended by admin",
+                        _utcnow() + timedelta(minutes=suspend_minutes),
+                    )
+                    applied.append("suspend")
+                    audit.append(("suspend_user", f"{suspend_minutes} min suspension"))
+                if mute_minutes is not None:
+                    _add_sanction(
+                        cur, username, "mute", reason or "Muted by admin",
+                        _utcnow() + timedelta(minutes=mute_minutes),
+                    )
+                    applied.append("mute")
+                    audit.append(("mute_user", f"{mute_minutes} min mute"))
+                if quota is not None:
+                    _set_quota(cur, username, quota)
+                    applied.append("quota")
+                    audit.append(("set_quota", f"{quota} msg/hr"))
+                if status is not None:
+                    _set_custom_status(cur, username, status)
+                    applied.append("status")
+                    audit.append(("override_status", status or "(cleared)"))
+                if role_name:
+                    user_id = _get_user_id(username)
+                    if not user_id:
+                        conn.rollback()
+                        return jsonify({"error": "User not found"}), 404
+                    role_id = _get_role_id(cur, role_name)
+                    if not role_id:
+                        conn.rollback()
+                        return jsonify({"error": "Role does not exist"}), 404
+                    _add_user_role(cur, user_id, role_id)
+                    applied.append("role")
+                    audit.append(("assign_role", f"Role: {role_name}"))
+                if shadowban:
+                    _add_sanction(cur, username, "shadowban", reason or "Shadowban issued")
+                    applied.append("shadowban")
+                    audit.append(("shadowban", reason or "Shadowban issued"))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            return jsonify({"error": str(e)}), 500
+
+        for action, details in audit:
+            log_audit_event(actor, action, username, details)
+        return jsonify({"ok": True, "user": username, "applied": applied})
+
     # ── Room controls ───────────────────────────────────────────────
     @app.route("/admin/lock_room/<room>", methods=["POST"])
     @require_permission("admin:basic")
@@ -2073,14 +2288,7 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
         limit = int(request.form.get("messages_per_hour", 60))
         conn = get_db()
         with conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO user_quotas (username, messages_per_hour)
-                VALUES (%s, %s)
-                ON CONFLICT (username) DO UPDATE SET messages_per_hour = EXCLUDED.messages_per_hour, updated_at = NOW();
-                """,
-                (username, limit),
-            )
+            _set_quota(cur, username, limit)
         conn.commit()
         log_audit_event(actor, "set_quota", username, f"{limit} msg/hr")
         return jsonify({"status": "quota_set", "limit": limit})
@@ -2095,7 +2303,7 @@ def register_admin_tools(app, settings, socketio=None, limiter=None):
 
         conn = get_db()
         with conn.cursor() as cur:
-            cur.execute("UPDATE users SET custom_status = %s WHERE username = %s;", (status, username))
+            _set_custom_status(cur, username, status)
         conn.commit()
         log_audit_event(actor, "override_status", username, status)
         return jsonify({"status": "status_set", "value": status})
@@ -71,7 +71,12 @@ from database import (
 )
 from security import hash_password, verify_password, verify_password_and_upgrade, log_audit_event
 from encryption import load_or_generate_key
-from admin_panel_inject import inject_admin_panel
+from admin_panel_inject import (
+    ADMIN_PANEL_ASSET_PREFIX,
+    get_admin_panel_asset,
+    inject_admin_panel,
+    is_versioned_admin_panel_asset,
+)
 from permissions import check_user_permission, get_user_permissions
 from emailer import send_email
 
@@ -88,6 +93,25 @@ def register_auth_routes(app, settings, limiter=None):
 
     # NOTE: Password reset tokens are stored server-side in PostgreSQL.
 
+    def _effective_is_admin(username: str, is_admin_db: bool) -> bool:
+        """Whether /chat should carry the admin UI for this user.
+
+        Admin UI injection should follow the same source-of-truth as backend guards:
+          - users.is_admin (legacy UI flag)
+          - session super-admin/admin flags (first-run override)
+          - RBAC permissions (admin:basic/admin:super)
+        """
+        rbac_admin = False
+        try:
+            rbac_admin = bool(
+                check_user_permission(username, "admin:super")
+                or check_user_permission(username, "admin:basic")
+            )
+        except Exception:
+            rbac_admin = False
+
+        return bool(is_admin_db or session.get("is_admin") or session.get("is_super_admin") or rbac_admin)
+
     @app.route("/chat")
     def chat_page():
         """Render the chat UI.
@@ -179,20 +203,7 @@ def register_auth_routes(app, settings, limiter=None):
         is_admin_db = bool(row[0])
         encrypted_priv = row[1] if (row and row[1]) else None
 
-        # Admin UI injection should follow the same source-of-truth as backend guards:
-        #   - users.is_admin (legacy UI flag)
-        #   - session super-admin/admin flags (first-run override)
-        #   - RBAC permissions (admin:basic/admin:super)
-        rbac_admin = False
-        try:
-            rbac_admin = bool(
-                check_user_permission(username, "admin:super")
-                or check_user_permission(username, "admin:basic")
-            )
-        except Exception:
-            rbac_admin = False
-
-        is_admin = bool(is_admin_db or session.get("is_admin") or session.get("is_super_admin") or rbac_admin)
+        is_admin = _effective_is_admin(username, is_admin_db)
 
         # For client-side UX (e.g., room policy banners), expose the user's effective RBAC permissions.
         try:
@@ -324,6 +335,50 @@ def register_auth_routes(app, settings, limiter=None):
         resp = make_response(html)
         return resp
 
+    @app.route(ADMIN_PANEL_ASSET_PREFIX + "<name>")
+    def admin_panel_asset(name):
+        """Serve the extracted admin panel CSS/JS.
+
+        Gated exactly like the /chat injection that references it (access
+        cookie may be expired, but the session must be active and the user an
+        admin), so the admin UI never becomes a public static asset.
+        """
+        access_cookie_name = app.config.get("JWT_ACCESS_COOKIE_NAME", "echochat_access")
+        access_token = request.cookies.get(access_cookie_name)
+        if not access_token:
+            return "", 404
+        try:
+            access_decoded = decode_token(access_token, allow_expired=True)
+            username = access_decoded.get("sub")
+            sid = access_decoded.get("sid")
+            if not username or not sid or not is_auth_session_active(sid, username=username):
+                return "", 404
+            conn = get_db()
+            with conn.cursor() as cur:
+                cur.execute("SELECT is_admin FROM users WHERE username = %s;", (username,))
+                row = cur.fetchone()
+        except Exception:
+            return "", 404
+        if not row or not _effective_is_admin(username, bool(row[0])):
+            return "", 404
+
+        asset = get_admin_panel_asset(name, request.headers.get("Accept-Encoding"))
+        if asset is None:
+            return "", 404
+        body, content_type, encoding, etag = asset
+        resp = make_response(body)
+        # content_type, not mimetype: the value already carries its charset.
+        resp.content_type = content_type
+        resp.headers["Vary"] = "Accept-Encoding, Cookie"
+        if is_versioned_admin_panel_asset(name):
+            resp.headers["Cache-Control"] = "private, max-age=31536000, immutable"
+        else:
+            resp.headers["Cache-Control"] = "private, max-age=3600"
+        if encoding:
+            resp.headers["Content-Encoding"] = encoding
+        resp.set_etag(etag)
+        return resp.make_conditional(request)
+
     @app.route("/token/refresh", methods=["POST"])
     @_limit(settings.get("rate_limit_refresh") or "30 per minute")
     @jwt_required(refresh=True)